@@ -1,41 +1,44 @@
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import TypeAdapter
 from typing import Optional
 import time
 import logging
-from models.query import QueryRequest, QueryResponse, ErrorResponse
+from models.query import QueryRequest, QueryResponse, BatchQueryRequest, BatchQueryResponse, ErrorResponse
 from services.rag_service import rag_service
 from config.settings import settings
+from utils.auth import limit_concurrent_requests, request_identity, request_slots
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Serialize responses directly instead of re-validating them through response_model
+QueryResponse_adapter = TypeAdapter(QueryResponse)
+BatchQueryResponse_adapter = TypeAdapter(BatchQueryResponse)
+
 @router.post("/query",
              response_model=QueryResponse,
              responses={
                  200: {"description": "Successful query response with citations"},
                  400: {"description": "Bad request - invalid query format", "model": ErrorResponse},
+                 401: {"description": "Missing or invalid API key (when REQUIRE_API_KEY is on)", "model": ErrorResponse},
+                 429: {"description": "Rate or concurrent request limit exceeded", "model": ErrorResponse},
                  500: {"description": "Internal server error", "model": ErrorResponse}
              })
-async def query_documentation(request: QueryRequest):
+async def query_documentation(request: QueryRequest, identity: str = Depends(limit_concurrent_requests)):
     """
     Submit a query to the RAG system
     Process a user query against documentation and return a grounded response with citations
     """
     try:
-        logger.info(f"Processing query: {request.query[:100]}...")  # Log first 100 chars
-
-        # Validate the query
-        if not request.query or len(request.query.strip()) == 0:
-            raise HTTPException(status_code=400, detail="Query cannot be empty")
+        logger.info("Processing query: %.100s...", request.query)  # Log first 100 chars
 
-        if len(request.query) > 2000:  # Max length from data model
-            raise HTTPException(status_code=400, detail="Query exceeds maximum length of 2000 characters")
+        # Query length and blank checks are enforced by QueryRequest validation
 
         # Process the query using the RAG service
-        response = rag_service.get_instance().query_documentation(request)
+        response = await rag_service.get_instance().query_documentation(request)
 
-        logger.info(f"Query processed successfully, response length: {len(response.answer)}")
-        return response
+        logger.info("Query processed successfully, response length: %d", len(response.answer))
+        return Response(content=QueryResponse_adapter.dump_json(response), media_type="application/json")
 
     except HTTPException:
         # Re-raise HTTP exceptions (like 400) as they are
@@ -47,6 +50,44 @@ async def query_documentation(request: QueryRequest):
             detail=f"Internal server error: {str(e)}"
         )
 
+@router.post("/query/batch",
+             response_model=BatchQueryResponse,
+             responses={
+                 200: {"description": "One response with citations per submitted query"},
+                 400: {"description": "Bad request - invalid query format", "model": ErrorResponse},
+                 401: {"description": "Missing or invalid API key (when REQUIRE_API_KEY is on)", "model": ErrorResponse},
+                 429: {"description": "Rate or concurrent request limit exceeded", "model": ErrorResponse},
+                 500: {"description": "Internal server error", "model": ErrorResponse}
+             })
+async def query_documentation_batch(request: BatchQueryRequest, identity: str = Depends(request_identity)):
+    """
+    Submit several queries to the RAG system
+    Embeds and searches all queries together and generates their answers concurrently
+    """
+    try:
+        logger.info("Processing batch of %d queries", len(request.queries))
+
+        # Each query counts against the caller's limits, and no more of them run at once
+        # than the in-flight slots the batch holds
+        with request_slots(identity, len(request.queries)) as slots:
+            responses = await rag_service.get_instance().query_documentation_batch(
+                request.queries, max_concurrency=slots
+            )
+
+        return Response(
+            content=BatchQueryResponse_adapter.dump_json(BatchQueryResponse(responses=responses)),
+            media_type="application/json"
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing batch query: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+
 # Additional utility endpoints
 @router.get("/health")
 async def query_health():
@@ -1,10 +1,7 @@
+from pydantic import Field
 from pydantic_settings import BaseSettings
-from typing import Optional
-import os
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
+from functools import lru_cache, cached_property
+from typing import Optional, Tuple
 
 class Settings(BaseSettings):
     # API Configuration
@@ -14,31 +11,60 @@ class Settings(BaseSettings):
     debug: bool = False
 
     # Qdrant Configuration - using the variables from your .env file
-    qdrant_api_key: str = os.getenv("QDRANT_API_KEY", "")
-    qdrant_url: str = os.getenv("QDRANT_URL", "http://localhost:6333")
-    qdrant_host: str = os.getenv("QDRANT_HOST", "localhost")  # fallback
-    qdrant_port: int = int(os.getenv("QDRANT_PORT", "6333"))  # fallback
-    qdrant_https: bool = os.getenv("QDRANT_HTTPS", "False").lower() == "true"  # fallback
+    qdrant_api_key: str = Field(default="", validation_alias="QDRANT_API_KEY")
+    qdrant_url: str = Field(default="http://localhost:6333", validation_alias="QDRANT_URL")
+    qdrant_host: str = Field(default="localhost", validation_alias="QDRANT_HOST")  # fallback
+    qdrant_port: int = Field(default=6333, validation_alias="QDRANT_PORT")  # fallback
+    qdrant_grpc_port: int = Field(default=6334, validation_alias="QDRANT_GRPC_PORT")
+    qdrant_https: bool = Field(default=False, validation_alias="QDRANT_HTTPS")  # fallback
 
     # AI Provider Configuration - using the variables from your .env file
-    anthropic_api_key: str = os.getenv("ANTHROPIC_API_KEY", "")
-    cohere_api_key: str = os.getenv("COHERE_API_KEY", "")
-    gemini_api_key: str = os.getenv("GEMINI_API_KEY", "")
-    openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
+    anthropic_api_key: str = Field(default="", validation_alias="ANTHROPIC_API_KEY")
+    cohere_api_key: str = Field(default="", validation_alias="COHERE_API_KEY")
+    gemini_api_key: str = Field(default="", validation_alias="GEMINI_API_KEY")
+    openai_api_key: str = Field(default="", validation_alias="OPENAI_API_KEY")
 
     # Collection name
-    collection_name: str = os.getenv("COLLECTION_NAME", "rag_embedding")
+    collection_name: str = Field(default="rag_embedding", validation_alias="COLLECTION_NAME")
 
     # Security Configuration
-    api_key: str = os.getenv("API_KEY", "your-secure-api-key")  # fallback
-    rate_limit_per_minute: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "10"))  # fallback
+    api_key: str = Field(default="your-secure-api-key", validation_alias="API_KEY")  # fallback
+    # Off by default so the query endpoints stay open; when on, they need a Bearer API_KEY
+    require_api_key: bool = Field(default=False, validation_alias="REQUIRE_API_KEY")
+    rate_limit_per_minute: int = Field(default=10, validation_alias="RATE_LIMIT_PER_MINUTE")  # fallback
+    max_concurrent_requests: int = Field(default=4, validation_alias="MAX_CONCURRENT_REQUESTS")
 
     # Application Configuration
-    allowed_origins: str = os.getenv("ALLOWED_ORIGINS", "*")  # fallback
+    allowed_origins: str = Field(default="*", validation_alias="ALLOWED_ORIGINS")  # fallback
+
+    # Retrieval Configuration
+    min_relevance_score: float = Field(default=0.0, validation_alias="MIN_RELEVANCE_SCORE")
+
+    # Semantic Cache Configuration
+    cache_similarity_threshold: float = Field(default=0.95, validation_alias="CACHE_SIMILARITY_THRESHOLD")
+    query_cache_collection_name: str = Field(default="query_cache", validation_alias="QUERY_CACHE_COLLECTION")
+    semantic_cache_ttl: int = Field(default=7200, validation_alias="SEMANTIC_CACHE_TTL")
+    query_cache_ttl: int = Field(default=7200, validation_alias="QUERY_CACHE_TTL")
+
+    # Answer Cache Configuration
+    answer_cache_path: str = Field(default="answer_cache.db", validation_alias="ANSWER_CACHE_PATH")
+    answer_cache_ttl: int = Field(default=86400, validation_alias="ANSWER_CACHE_TTL")
+
+    @cached_property
+    def cors_origins(self) -> Tuple[str, ...]:
+        """Allowed CORS origins, parsed once from the comma-separated setting"""
+        if self.allowed_origins.strip() == "*":
+            return ("*",)
+        return tuple(origin.strip() for origin in self.allowed_origins.split(",") if origin.strip())
 
     class Config:
+        # Environment variables and the .env file are parsed once, by pydantic
         env_file = ".env"
         # Allow extra fields to avoid validation errors
         extra = "allow"
 
-settings = Settings()
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    return Settings()
+
+settings = get_settings()
\ No newline at end of file
@@ -1,11 +1,7 @@
-import os
-from dotenv import load_dotenv
+from config.settings import settings
 
-# Load environment variables
-load_dotenv()
-
-# Get the GEMINI_API_KEY from environment variables
-gemini_api_key = os.getenv("GEMINI_API_KEY")
+# Get the GEMINI_API_KEY from the shared application settings
+gemini_api_key = settings.gemini_api_key
 
 if not gemini_api_key:
     raise ValueError("GEMINI_API_KEY is not set. Please ensure it is defined in your .env file.")
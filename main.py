@@ -2,18 +2,20 @@ from fastapi import FastAPI, Request, BackgroundTasks
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+import asyncio
 import logging
+import os
 import time
 import uvicorn
 from config.settings import settings
 from api.v1 import api_router
-from utils.monitoring import monitoring_service
+from utils.monitoring import monitoring_service, start_log_listener, stop_log_listener
 from services.qdrant_service import qdrant_service
 from services.agent_service import agent_service
 
 # Configure logging
 logging.basicConfig(
-    level=logging.INFO if not settings.debug else logging.DEBUG,
+    level=logging.WARNING if not settings.debug else logging.DEBUG,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
@@ -29,12 +31,36 @@ app = FastAPI(
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.allowed_origins.split(",") if settings.allowed_origins != "*" else ["*"],
+    allow_origins=settings.cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Request metrics are logged by a single background consumer so the response is not held up
+request_log_queue: "asyncio.Queue" = None
+request_log_task: "asyncio.Task" = None
+
+async def drain_request_log():
+    """Log queued request metrics off the request-response path"""
+    while True:
+        request, response, process_time = await request_log_queue.get()
+        try:
+            await asyncio.to_thread(monitoring_service.get_instance().log_request, request, response, process_time)
+        except Exception as e:
+            logger.error(f"Error logging request metrics: {e}")
+        finally:
+            request_log_queue.task_done()
+
+# Startup event handler
+@app.on_event("startup")
+async def startup_event():
+    global request_log_queue, request_log_task
+    # Write log records from a background thread
+    start_log_listener()
+    request_log_queue = asyncio.Queue(maxsize=10000)
+    request_log_task = asyncio.create_task(drain_request_log())
+
 # Add request timing middleware
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
@@ -43,10 +69,14 @@ async def add_process_time_header(request: Request, call_next):
     process_time = time.time() - start_time
     response.headers["X-Process-Time"] = str(process_time)
 
-    # Log request metrics
-    monitoring_service.get_instance().log_request(request, response, process_time)
+    # Log request metrics (inline only if the background consumer is not running or is backed up)
+    try:
+        request_log_queue.put_nowait((request, response, process_time))
+    except (AttributeError, asyncio.QueueFull):
+        monitoring_service.get_instance().log_request(request, response, process_time)
 
-    logger.info(f"Request {request.method} {request.url.path} took {process_time:.3f}s")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Request %s %s took %.3fs", request.method, request.url.path, process_time)
     return response
 
 # Include API routes
@@ -74,8 +104,20 @@ async def shutdown_event():
 
     # Perform cleanup operations
     try:
+        # Flush pending request metrics before stopping the consumer
+        if request_log_task is not None:
+            try:
+                await asyncio.wait_for(request_log_queue.join(), timeout=5)
+            except asyncio.TimeoutError:
+                logger.warning("Timed out flushing request metrics")
+            request_log_task.cancel()
+
+        # Close the Qdrant gRPC channel while its event loop is still running
+        await qdrant_service.close()
+
         # Any cleanup operations for services can go here
         logger.info("Cleanup completed")
+        stop_log_listener()
     except Exception as e:
         logger.error(f"Error during shutdown cleanup: {e}")
 
@@ -85,5 +127,9 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=settings.debug,
-        log_level="info" if not settings.debug else "debug"
+        loop="uvloop",
+        http="httptools",
+        # Reload mode only supports a single worker; the default matches the Dockerfile
+        workers=1 if settings.debug else int(os.getenv("WEB_CONCURRENCY", "1")),
+        log_level="warning" if not settings.debug else "debug"
     )
\ No newline at end of file
@@ -1,3 +1,3 @@
-from .query import QueryRequest, QueryResponse, Citation, ErrorResponse
+from .query import QueryRequest, QueryResponse, BatchQueryRequest, BatchQueryResponse, Citation, ErrorResponse
 
-__all__ = ["QueryRequest", "QueryResponse", "Citation", "ErrorResponse"]
\ No newline at end of file
+__all__ = ["QueryRequest", "QueryResponse", "BatchQueryRequest", "BatchQueryResponse", "Citation", "ErrorResponse"]
\ No newline at end of file
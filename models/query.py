@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import List, Optional
 from datetime import datetime
 import uuid
@@ -29,14 +29,24 @@ class QueryRequest(BaseModel):
     session_id: Optional[str] = Field(default=None, description="Unique identifier for the conversation session")
     metadata: Optional[dict] = Field(default=None, description="Additional context information")
 
-    class Config:
-        json_schema_extra = {
+    @field_validator("query")
+    @classmethod
+    def query_not_blank(cls, v: str) -> str:
+        """Reject whitespace-only queries (length limits are enforced by the field constraints)"""
+        stripped = v.strip()
+        if not stripped:
+            raise ValueError("Query cannot be empty")
+        return stripped
+
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "query": "How do I configure ROS 2 parameters?",
                 "selected_text": "",
                 "session_id": "550e8400-e29b-41d4-a716-446655440000"
             }
         }
+    )
 
 
 class QueryResponse(BaseModel):
@@ -46,13 +56,13 @@ class QueryResponse(BaseModel):
     answer: str = Field(..., description="The AI-generated response to the query",
                         min_length=1, max_length=10000)
     citations: List[Citation] = Field(..., description="List of source documents referenced",
-                                      max_items=20)
+                                      max_length=20)
     query_id: str = Field(..., description="Unique identifier for this query")
     timestamp: str = Field(..., description="ISO 8601 timestamp of response generation")
     metadata: Optional[dict] = Field(default=None, description="Additional response metadata")
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "answer": "To configure ROS 2 parameters, you can use the parameter_namespace approach...",
                 "citations": [
@@ -72,6 +82,22 @@ class QueryResponse(BaseModel):
                 }
             }
         }
+    )
+
+
+class BatchQueryRequest(BaseModel):
+    """
+    Several queries answered in one round-trip, e.g. the intents of a multi-part question
+    """
+    queries: List[QueryRequest] = Field(..., description="Queries to answer",
+                                        min_length=1, max_length=10)
+
+
+class BatchQueryResponse(BaseModel):
+    """
+    Responses for a batch query, in the same order as the submitted queries
+    """
+    responses: List[QueryResponse] = Field(..., description="One response per submitted query")
 
 
 class ErrorResponse(BaseModel):
@@ -85,11 +111,12 @@ class ErrorResponse(BaseModel):
     details: Optional[dict] = Field(default=None, description="Additional error details")
     timestamp: str = Field(..., description="ISO 8601 timestamp of error")
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "error_code": "ERROR_INVALID_QUERY",
                 "message": "Query must be between 1 and 2000 characters",
                 "timestamp": "2025-12-15T10:30:00.000Z"
             }
-        }
\ No newline at end of file
+        }
+    )
\ No newline at end of file
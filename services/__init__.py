@@ -1,5 +1,7 @@
 from .qdrant_service import qdrant_service
 from .agent_service import agent_service
 from .rag_service import rag_service
+from .semantic_cache import semantic_cache
+from .answer_cache import answer_cache
 
-__all__ = ["qdrant_service", "agent_service", "rag_service"]
\ No newline at end of file
+__all__ = ["qdrant_service", "agent_service", "rag_service", "semantic_cache", "answer_cache"]
\ No newline at end of file
@@ -1,24 +1,29 @@
 import anthropic
+import asyncio
+import hashlib
 from typing import List, Dict, Any, Optional
 import logging
 from config.settings import settings
 from models.query import Citation
+from services.answer_cache import answer_cache
 
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = "You are a helpful assistant that answers questions based on provided documentation. Always cite your sources from the provided context. If the context doesn't contain enough information to answer the question, please say so."
+
 class AgentService:
     def __init__(self):
         # Check for available AI providers and initialize the first available one
         if settings.anthropic_api_key:
             self.provider = "anthropic"
-            self.client = anthropic.Anthropic(api_key=settings.anthropic_api_key)
+            self.client = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key)
             self.model = "claude-3-sonnet-20240229"
         elif settings.gemini_api_key:
             self.provider = "gemini"
             # Import and initialize Gemini via OpenAI-compatible endpoint
             try:
-                from openai import OpenAI
-                self.client = OpenAI(
+                from openai import AsyncOpenAI
+                self.client = AsyncOpenAI(
                     api_key=settings.gemini_api_key,
                     base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
                 )
@@ -30,8 +35,8 @@ class AgentService:
             self.provider = "openai"
             # Import and initialize OpenAI if available
             try:
-                from openai import OpenAI
-                self.client = OpenAI(api_key=settings.openai_api_key)
+                from openai import AsyncOpenAI
+                self.client = AsyncOpenAI(api_key=settings.openai_api_key)
                 self.model = "gpt-3.5-turbo"  # or another appropriate model
             except ImportError:
                 logger.error("OpenAI library not installed. Install with: pip install openai")
@@ -42,52 +47,93 @@ class AgentService:
             self.provider = "mock"
             self.model = None
 
-    def generate_response(self, query: str, context: List[Dict[str, Any]], selected_text: str = "") -> Dict[str, Any]:
+    async def generate_response(self, query: str, context: List[Dict[str, Any]], selected_text: str = "") -> Dict[str, Any]:
         """
         Generate a response using the configured AI provider with provided context
         """
         try:
-            # Format the context into a readable format for the agent
-            context_text = ""
-            citations = []
-
-            for i, doc in enumerate(context):
-                doc_text = doc.get("content", "")[:1000]  # Limit context size
-                context_text += f"\n\nDocument {i+1}:\n{doc_text}\n"
-
-                # Create citation object
-                citation = Citation(
+            # Canonicalize document order so the same retrieved set always yields the same
+            # prompt prefix, letting the provider reuse its cached prefix across queries
+            context = sorted(context, key=lambda doc: str(doc.get("document_id", "")))
+
+            # Snippets (for citations) and context prefixes (for the prompt) are length-limited
+            # at index time, so each is read once
+            snippets = [doc.get("text_snippet", "") for doc in context]
+            context_prefixes = [doc.get("context_prefix") or snippet for doc, snippet in zip(context, snippets)]
+
+            # Create citation objects
+            citations = [
+                Citation(
                     document_id=doc.get("document_id", f"doc_{i}"),
                     title=doc.get("title", "Unknown Title"),
                     url=doc.get("url", ""),
-                    text_snippet=doc.get("text_snippet", doc.get("content", "")[:200]),
+                    text_snippet=snippets[i],
                     relevance_score=doc.get("relevance_score", 0.0)
                 )
-                citations.append(citation)
-
-            # Build the full prompt
-            prompt_parts = []
-
-            if selected_text:
-                prompt_parts.append(f"User selected this text: {selected_text}\n\n")
+                for i, doc in enumerate(context)
+            ]
 
-            prompt_parts.append(f"Context:\n{context_text}\n\n")
-            prompt_parts.append(f"Question: {query}\n\n")
-            prompt_parts.append("Please provide a comprehensive answer based on the provided context. If the context doesn't contain enough information to answer the question, please say so. Always cite your sources from the provided context.")
+            if self.provider == "mock":
+                # For development/testing, return a mock response without assembling a prompt
+                logger.info("Generated response using %s", self.provider)
+                return {
+                    "answer": f"This is a mock response for your query: '{query}'. In a real implementation, this would be generated by an AI model using the provided context.",
+                    "citations": citations,
+                    "model_used": "mock",
+                }
 
-            full_prompt = "".join(prompt_parts)
+            # Format the context into a readable format for the agent
+            context_text = "".join(f"\n\nDocument {i+1}:\n{prefix}\n" for i, prefix in enumerate(context_prefixes))
+
+            # Build the full prompt: the cacheable context prefix first, the variable question last
+            context_prompt = f"Context:\n{context_text}\n\n"
+
+            selected_prompt = f"User selected this text: {selected_text}\n\n" if selected_text else ""
+            question_prompt = (
+                f"{selected_prompt}Question: {query}\n\n"
+                "Please provide a comprehensive answer based on the provided context. If the context doesn't contain enough information to answer the question, please say so. Always cite your sources from the provided context."
+            )
+            full_prompt = context_prompt + question_prompt
+
+            # Repeated questions over the same context are answered from the on-disk cache;
+            # sqlite calls run on a worker thread so they never block the event loop
+            cache_key = answer_cache.get_instance().make_key(self.model, full_prompt)
+            cached_answer = await asyncio.to_thread(answer_cache.get_instance().get, cache_key)
+            if cached_answer:
+                logger.info("Returning cached answer from %s", self.provider)
+                return {
+                    "answer": cached_answer["answer"],
+                    "citations": [Citation(**citation) for citation in cached_answer["citations"]],
+                    "model_used": self.model,
+                }
 
             if self.provider == "anthropic":
                 # Generate response using Anthropic Claude
-                message = self.client.messages.create(
+                message = await self.client.messages.create(
                     model=self.model,
                     max_tokens=1024,
                     temperature=0.3,
-                    system="You are a helpful assistant that answers questions based on provided documentation. Always cite your sources from the provided context. If the context doesn't contain enough information to answer the question, please say so.",
+                    system=[
+                        {
+                            "type": "text",
+                            "text": SYSTEM_PROMPT,
+                            "cache_control": {"type": "ephemeral"}
+                        }
+                    ],
                     messages=[
                         {
                             "role": "user",
-                            "content": full_prompt
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": context_prompt,
+                                    "cache_control": {"type": "ephemeral"}
+                                },
+                                {
+                                    "type": "text",
+                                    "text": question_prompt
+                                }
+                            ]
                         }
                     ]
                 )
@@ -105,12 +151,12 @@ class AgentService:
 
             elif self.provider == "gemini":
                 # Generate response using Gemini via OpenAI-compatible endpoint
-                response = self.client.chat.completions.create(
+                response = await self.client.chat.completions.create(
                     model=self.model,
                     messages=[
                         {
                             "role": "system",
-                            "content": "You are a helpful assistant that answers questions based on provided documentation. Always cite your sources from the provided context. If the context doesn't contain enough information to answer the question, please say so."
+                            "content": SYSTEM_PROMPT
                         },
                         {
                             "role": "user",
@@ -130,12 +176,12 @@ class AgentService:
 
             elif self.provider == "openai":
                 # Generate response using OpenAI
-                response = self.client.chat.completions.create(
+                response = await self.client.chat.completions.create(
                     model=self.model,
                     messages=[
                         {
                             "role": "system",
-                            "content": "You are a helpful assistant that answers questions based on provided documentation. Always cite your sources from the provided context. If the context doesn't contain enough information to answer the question, please say so."
+                            "content": SYSTEM_PROMPT
                         },
                         {
                             "role": "user",
@@ -143,7 +189,8 @@ class AgentService:
                         }
                     ],
                     max_tokens=1024,
-                    temperature=0.3
+                    temperature=0.3,
+                    extra_body={"prompt_cache_key": hashlib.sha256(context_prompt.encode()).hexdigest()}
                 )
 
                 response_text = response.choices[0].message.content if response.choices[0].message.content else "I couldn't generate a response based on the provided context."
@@ -154,15 +201,14 @@ class AgentService:
                     "model_used": self.model,
                 }
 
-            elif self.provider == "mock":
-                # For development/testing, return a mock response
-                result = {
-                    "answer": f"This is a mock response for your query: '{query}'. In a real implementation, this would be generated by an AI model using the provided context.",
-                    "citations": citations,
-                    "model_used": "mock",
-                }
+            await asyncio.to_thread(
+                answer_cache.get_instance().set,
+                cache_key,
+                result["answer"],
+                [citation.model_dump() for citation in citations]
+            )
 
-            logger.info(f"Generated response using {self.provider}")
+            logger.info("Generated response using %s", self.provider)
             return result
 
         except Exception as e:
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional
+import logging
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class AnswerCache:
+    """
+    On-disk cache of generated answers keyed by (model, prompt), so repeated
+    questions over the same context skip the LLM round-trip entirely
+    """
+
+    def __init__(self, path: str = settings.answer_cache_path, ttl: int = settings.answer_cache_ttl):
+        self.path = path
+        self.ttl = ttl
+        # sqlite connections cannot be shared across threads, so keep one per thread
+        self._local = threading.local()
+        self._get_connection()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key BLOB PRIMARY KEY, answer TEXT, citations_json TEXT, created_at INT)"
+            )
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> bytes:
+        """Generate a cache key based on the model and the canonicalized prompt"""
+        return hashlib.sha256(f"{model}\0{prompt}".encode()).digest()
+
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        """Get a cached answer and its citations, if present and not expired"""
+        try:
+            row = self._get_connection().execute(
+                "SELECT answer, citations_json, created_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading answer cache: {e}")
+            return None
+
+        if row is None or time.time() - row[2] > self.ttl:
+            return None
+
+        return {"answer": row[0], "citations": json.loads(row[1])}
+
+    def set(self, key: bytes, answer: str, citations: List[Dict[str, Any]]) -> None:
+        """Store a generated answer and its citations"""
+        try:
+            connection = self._get_connection()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO answers (key, answer, citations_json, created_at) VALUES (?, ?, ?, ?)",
+                    (key, answer, json.dumps(citations), int(time.time()))
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Error writing answer cache: {e}")
+
+    def clear(self) -> None:
+        """Clear all answers from the cache"""
+        connection = self._get_connection()
+        with connection:
+            connection.execute("DELETE FROM answers")
+        logger.info("Answer cache cleared")
+
+# Create a singleton instance with lazy initialization
+class AnswerCacheManager:
+    def __init__(self):
+        self._instance = None
+
+    def get_instance(self):
+        if self._instance is None:
+            self._instance = AnswerCache()
+        return self._instance
+
+answer_cache = AnswerCacheManager()
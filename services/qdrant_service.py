@@ -1,30 +1,53 @@
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient
 from qdrant_client.http import models
 from qdrant_client.http.models import PointStruct, VectorParams, Distance
 from typing import List, Optional, Dict, Any
 import logging
+import time
+import uuid
+import numpy as np
 from config.settings import settings
+from services.semantic_cache import semantic_cache
 
 logger = logging.getLogger(__name__)
 
+# Snippets and the LLM context prefix are precomputed at indexing time so searches never
+# transfer the full document body
+SNIPPET_LENGTH = 500
+CONTEXT_LENGTH = 1000
+SEARCH_PAYLOAD_FIELDS = ["title", "url", "text_snippet", "context_prefix", "metadata"]
+# Candidates fetched on the binary-quantized vectors per final result before the full-precision rerank
+PREFETCH_FACTOR = 10
+MIN_HNSW_EF = 128
+# The rerank stage scores the prefetched candidates against the original vectors
+RERANK_SEARCH_PARAMS = models.SearchParams(quantization=models.QuantizationSearchParams(ignore=True))
+# Expired query cache entries are deleted at most this often (seconds)
+QUERY_CACHE_PURGE_INTERVAL = 300
+
 class QdrantService:
     def __init__(self):
-        # Initialize Qdrant client with settings
+        # Initialize Qdrant client with settings; one gRPC channel is shared by every call
         try:
             if settings.qdrant_url:
                 # Use cloud instance with URL
-                self.client = QdrantClient(
+                self.client = AsyncQdrantClient(
                     url=settings.qdrant_url,
                     api_key=settings.qdrant_api_key,
-                    https=True
+                    https=True,
+                    prefer_grpc=True,
+                    grpc_port=settings.qdrant_grpc_port,
+                    timeout=30
                 )
                 logger.info(f"Connected to Qdrant cloud instance at {settings.qdrant_url}")
             else:
                 # Use local instance
-                self.client = QdrantClient(
+                self.client = AsyncQdrantClient(
                     host=settings.qdrant_host,
                     port=settings.qdrant_port,
-                    https=settings.qdrant_https
+                    https=settings.qdrant_https,
+                    prefer_grpc=True,
+                    grpc_port=settings.qdrant_grpc_port,
+                    timeout=30
                 )
                 logger.info(f"Connected to Qdrant at {settings.qdrant_host}:{settings.qdrant_port}")
         except Exception as e:
@@ -32,21 +55,33 @@ class QdrantService:
             raise
 
         self.collection_name = settings.collection_name
-        self.vector_size = 1536  # Standard size for OpenAI embeddings; adjust as needed
+        self.query_cache_collection_name = settings.query_cache_collection_name
+        self._query_cache_ready = False
+        self._query_cache_purged_at = 0.0
+        self.vector_size = 1024  # Cohere embed-english-v3.0 dimension, also used by the mock embeddings
         self.distance = Distance.COSINE
 
-    def create_collection(self):
+    async def create_collection(self):
         """Create Qdrant collection if it doesn't exist"""
         try:
             # Check if collection exists
-            collections = self.client.get_collections().collections
+            collections = (await self.client.get_collections()).collections
             collection_names = [col.name for col in collections]
 
             if self.collection_name not in collection_names:
                 # Create new collection
-                self.client.create_collection(
+                await self.client.create_collection(
                     collection_name=self.collection_name,
-                    vectors_config=VectorParams(size=self.vector_size, distance=self.distance)
+                    # Original vectors (used for rescoring) are stored at half precision
+                    vectors_config=VectorParams(
+                        size=self.vector_size,
+                        distance=self.distance,
+                        datatype=models.Datatype.FLOAT16
+                    ),
+                    # Keep 1-bit copies of the vectors in RAM so candidate distances are cheap Hamming scans
+                    quantization_config=models.BinaryQuantization(
+                        binary=models.BinaryQuantizationConfig(always_ram=True)
+                    )
                 )
                 logger.info(f"Created Qdrant collection: {self.collection_name}")
             else:
@@ -55,51 +90,264 @@ class QdrantService:
             logger.error(f"Error creating Qdrant collection: {e}")
             raise
 
-    def search_documents(self, query_vector: List[float], limit: int = 5) -> List[Dict[str, Any]]:
-        """Search for documents similar to the query vector"""
-        try:
-            # Perform similarity search
-            search_results = self.client.search(
-                collection_name=self.collection_name,
-                query_vector=query_vector,
-                limit=limit
+    def _rerank_prefetch(self, query_vector, limit: int) -> List[models.Prefetch]:
+        """Wide first stage searched on the binary-quantized vectors"""
+        return [
+            models.Prefetch(
+                query=query_vector,
+                limit=limit * PREFETCH_FACTOR,
+                params=models.SearchParams(
+                    # The HNSW beam must be at least as wide as the candidate list it feeds
+                    hnsw_ef=max(MIN_HNSW_EF, limit * PREFETCH_FACTOR),
+                    exact=False,
+                    quantization=models.QuantizationSearchParams(ignore=False, rescore=False)
+                )
             )
+        ]
+
+    async def query_with_rerank(self, query_vector: np.ndarray, limit: int = 5) -> List[models.ScoredPoint]:
+        """
+        Two-stage search in a single RPC: a wide prefetch on the binary-quantized vectors,
+        reranked server-side against the full-precision vectors
+        """
+        search_results = await self.client.query_points(
+            collection_name=self.collection_name,
+            prefetch=self._rerank_prefetch(query_vector, limit),
+            query=query_vector,
+            limit=limit,
+            search_params=RERANK_SEARCH_PARAMS,
+            # Fetch only the payload fields we use
+            with_payload=models.PayloadSelectorInclude(include=SEARCH_PAYLOAD_FIELDS),
+            with_vectors=False
+        )
+        await self._backfill_legacy_payloads(search_results.points)
+        return search_results.points
+
+    async def _backfill_legacy_payloads(self, points: List[models.ScoredPoint]) -> None:
+        """Derive the snippet and context prefix for points indexed before they were stored"""
+        legacy = [point for point in points if "context_prefix" not in (point.payload or {})]
+        if not legacy:
+            return
+
+        records = await self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=[point.id for point in legacy],
+            with_payload=models.PayloadSelectorInclude(include=["content"]),
+            with_vectors=False
+        )
+        contents = {record.id: (record.payload or {}).get("content", "") for record in records}
+        for point in legacy:
+            content = contents.get(point.id, "")
+            point.payload = {
+                **(point.payload or {}),
+                "text_snippet": content[:SNIPPET_LENGTH],
+                "context_prefix": content[:CONTEXT_LENGTH],
+                "context_prefix": content[:CONTEXT_LENGTH]
+            }
+
+    async def query_with_rerank_batch(self, query_vectors: np.ndarray, limit: int = 5) -> List[List[models.ScoredPoint]]:
+        """Run the prefetch + rerank search for every row of query_vectors in a single RPC"""
+        requests = []
+        for query_vector in query_vectors:
+            # QueryRequest only accepts lists, so convert each row once up front
+            query = query_vector.tolist()
+            requests.append(models.QueryRequest(
+                prefetch=self._rerank_prefetch(query, limit),
+                query=query,
+                limit=limit,
+                params=RERANK_SEARCH_PARAMS,
+                with_payload=models.PayloadSelectorInclude(include=SEARCH_PAYLOAD_FIELDS),
+                with_vector=False
+            ))
+
+        batch_results = await self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=requests
+        )
+        batch_points = [response.points for response in batch_results]
+        # One retrieve for the legacy points of every query
+        await self._backfill_legacy_payloads([point for points in batch_points for point in points])
+        return batch_points
+
+    def _format_results(self, points: List[models.ScoredPoint], limit: int) -> List[Dict[str, Any]]:
+        """Filter hits by relevance and shape the top `limit` into result dicts"""
+        # Filter and pick the top hits on a score array so dicts are only built for the survivors
+        scores = np.fromiter((hit.score for hit in points), dtype=np.float32, count=len(points))
+        keep = np.flatnonzero(scores >= settings.min_relevance_score)
+        if len(keep) > limit:
+            keep = keep[np.argpartition(-scores[keep], limit - 1)[:limit]]
+        top = keep[np.argsort(-scores[keep], kind="stable")]
 
-            # Extract and format results
-            results = []
-            for hit in search_results:
-                result = {
-                    "document_id": hit.id,
-                    "content": hit.payload.get("content", ""),
-                    "title": hit.payload.get("title", ""),
-                    "url": hit.payload.get("url", ""),
-                    "text_snippet": hit.payload.get("content", "")[:500],  # First 500 chars as snippet
-                    "relevance_score": float(hit.score),
-                    "metadata": hit.payload.get("metadata", {})
-                }
-                results.append(result)
-
-            logger.info(f"Found {len(results)} documents for query")
+        # Extract and format results (full content is not transferred on the search path)
+        return [
+            {
+                "document_id": hit.id,
+                "title": payload.get("title", ""),
+                "url": payload.get("url", ""),
+                "text_snippet": payload.get("text_snippet", ""),
+                "context_prefix": payload.get("context_prefix", ""),
+                "relevance_score": float(hit.score),
+                "metadata": payload.get("metadata", {})
+            }
+            for hit in (points[i] for i in top)
+            for payload in (hit.payload,)
+        ]
+
+    async def search_documents(self, query_vector: np.ndarray, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Search for documents similar to the query vector
+        The vector should be a float32, L2-normalized array; it is passed to qdrant-client as-is
+        """
+        try:
+            # Serve near-duplicate queries from the semantic cache without a Qdrant round-trip
+            cached = semantic_cache.get(query_vector)
+            if cached is not None:
+                logger.info("Returning %d semantically cached documents", len(cached["results"]))
+                return cached["results"]
+
+            points = await self.query_with_rerank(query_vector, limit)
+            results = self._format_results(points, limit)
+
+            semantic_cache.set(query_vector, results)
+
+            logger.info("Found %d documents for query", len(results))
             return results
         except Exception as e:
             logger.error(f"Error searching documents in Qdrant: {e}")
             # Return empty list instead of raising exception to allow graceful degradation
             return []
 
-    def add_document(self, document_id: str, content: str, title: str, url: str,
+    async def search_documents_batch(self, query_vectors: np.ndarray, limit: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Search for documents similar to each row of a float32, L2-normalized matrix in one RPC
+        """
+        try:
+            batch_points = await self.query_with_rerank_batch(query_vectors, limit)
+            results = [self._format_results(points, limit) for points in batch_points]
+
+            for query_vector, docs in zip(query_vectors, results):
+                semantic_cache.set(query_vector, docs)
+
+            logger.info("Found documents for %d queries in batch", len(results))
+            return results
+        except Exception as e:
+            logger.error(f"Error batch searching documents in Qdrant: {e}")
+            return [[] for _ in query_vectors]
+
+    async def _ensure_query_cache_collection(self, vector_size: int):
+        """Create the query cache collection on first use, sized to the embedding provider"""
+        if self._query_cache_ready:
+            return
+        if not await self.client.collection_exists(self.query_cache_collection_name):
+            await self.client.create_collection(
+                collection_name=self.query_cache_collection_name,
+                vectors_config=VectorParams(size=vector_size, distance=self.distance)
+            )
+            logger.info(f"Created Qdrant collection: {self.query_cache_collection_name}")
+        # Every cache search filters on both fields
+        await self.client.create_payload_index(
+            collection_name=self.query_cache_collection_name,
+            field_name="selected_text",
+            field_schema=models.PayloadSchemaType.KEYWORD
+        )
+        await self.client.create_payload_index(
+            collection_name=self.query_cache_collection_name,
+            field_name="ts",
+            field_schema=models.PayloadSchemaType.INTEGER
+        )
+        self._query_cache_ready = True
+
+    async def _delete_cached_responses(self, before: int):
+        """Delete query cache entries stored before the `before` timestamp"""
+        await self.client.delete(
+            collection_name=self.query_cache_collection_name,
+            points_selector=models.FilterSelector(filter=models.Filter(must=[
+                models.FieldCondition(key="ts", range=models.Range(lt=before))
+            ])),
+            wait=False
+        )
+
+    async def clear_query_cache(self):
+        """Drop every cached response, e.g. because the indexed content changed"""
+        try:
+            if self._query_cache_ready or await self.client.collection_exists(self.query_cache_collection_name):
+                await self._delete_cached_responses(before=int(time.time()) + 1)
+        except Exception as e:
+            logger.error(f"Error clearing query cache: {e}")
+
+    async def search_cached_response(self, query_vector: np.ndarray, selected_text: str,
+                                     threshold: float, ttl: int) -> Optional[str]:
+        """
+        Return the serialized response of the most similar previously answered query,
+        if it is at least `threshold` similar, has the same selected text and is younger than `ttl`
+        """
+        try:
+            await self._ensure_query_cache_collection(len(query_vector))
+            search_results = await self.client.query_points(
+                collection_name=self.query_cache_collection_name,
+                query=query_vector,
+                limit=1,
+                score_threshold=threshold,
+                query_filter=models.Filter(must=[
+                    models.FieldCondition(key="selected_text", match=models.MatchValue(value=selected_text)),
+                    models.FieldCondition(key="ts", range=models.Range(gte=int(time.time()) - ttl))
+                ]),
+                with_payload=models.PayloadSelectorInclude(include=["response_json"]),
+                with_vectors=False
+            )
+            if not search_results.points:
+                return None
+            logger.info("Query cache hit with score %.3f", search_results.points[0].score)
+            return search_results.points[0].payload["response_json"]
+        except Exception as e:
+            logger.error(f"Error searching query cache in Qdrant: {e}")
+            return None
+
+    async def cache_response(self, query_vector: np.ndarray, query: str, selected_text: str,
+                             response_json: str) -> bool:
+        """Store a serialized response under its query embedding"""
+        try:
+            await self._ensure_query_cache_collection(len(query_vector))
+            now = int(time.time())
+            await self.client.upsert(
+                collection_name=self.query_cache_collection_name,
+                points=[
+                    PointStruct(
+                        # Re-answering the same question replaces its entry instead of adding one
+                        id=str(uuid.uuid5(uuid.NAMESPACE_OID, f"{selected_text}\x00{query}")),
+                        vector=query_vector.tolist(),
+                        payload={
+                            "response_json": response_json,
+                            "selected_text": selected_text,
+                            "ts": now
+                        }
+                    )
+                ]
+            )
+            if now - self._query_cache_purged_at >= QUERY_CACHE_PURGE_INTERVAL:
+                self._query_cache_purged_at = now
+                await self._delete_cached_responses(before=now - settings.query_cache_ttl)
+            return True
+        except Exception as e:
+            logger.error(f"Error storing response in query cache: {e}")
+            return False
+
+    async def add_document(self, document_id: str, content: str, title: str, url: str,
                      embedding: List[float], metadata: Optional[Dict[str, Any]] = None) -> bool:
         """Add a document to the Qdrant collection"""
         try:
             # Prepare payload
             payload = {
                 "content": content,
+                "text_snippet": content[:SNIPPET_LENGTH],
+                "context_prefix": content[:CONTEXT_LENGTH],
                 "title": title,
                 "url": url,
                 "metadata": metadata or {}
             }
 
             # Add point to collection
-            self.client.upsert(
+            await self.client.upsert(
                 collection_name=self.collection_name,
                 points=[
                     PointStruct(
@@ -110,13 +358,17 @@ class QdrantService:
                 ]
             )
 
+            # Cached results and answers predate the new content
+            semantic_cache.clear()
+            await self.clear_query_cache()
+
             logger.info(f"Added document {document_id} to Qdrant")
             return True
         except Exception as e:
             logger.error(f"Error adding document {document_id} to Qdrant: {e}")
             return False
 
-    def batch_add_documents(self, documents: List[Dict[str, Any]]) -> bool:
+    async def batch_add_documents(self, documents: List[Dict[str, Any]]) -> bool:
         """Add multiple documents to the Qdrant collection"""
         try:
             points = []
@@ -126,6 +378,8 @@ class QdrantService:
                     vector=doc["embedding"],
                     payload={
                         "content": doc["content"],
+                        "text_snippet": doc["content"][:SNIPPET_LENGTH],
+                        "context_prefix": doc["content"][:CONTEXT_LENGTH],
                         "title": doc["title"],
                         "url": doc["url"],
                         "metadata": doc.get("metadata", {})
@@ -133,21 +387,25 @@ class QdrantService:
                 )
                 points.append(point)
 
-            self.client.upsert(
+            await self.client.upsert(
                 collection_name=self.collection_name,
                 points=points
             )
 
+            # Cached results and answers predate the new content
+            semantic_cache.clear()
+            await self.clear_query_cache()
+
             logger.info(f"Added {len(documents)} documents to Qdrant in batch")
             return True
         except Exception as e:
             logger.error(f"Error adding documents to Qdrant in batch: {e}")
             return False
 
-    def delete_collection(self):
+    async def delete_collection(self):
         """Delete the collection (useful for testing/resetting)"""
         try:
-            self.client.delete_collection(collection_name=self.collection_name)
+            await self.client.delete_collection(collection_name=self.collection_name)
             logger.info(f"Deleted Qdrant collection: {self.collection_name}")
         except Exception as e:
             logger.error(f"Error deleting Qdrant collection: {e}")
@@ -163,4 +421,10 @@ class QdrantServiceManager:
             self._instance = QdrantService()
         return self._instance
 
+    async def close(self):
+        """Close the client's channel; the next get_instance() reconnects on the running event loop"""
+        if self._instance is not None:
+            instance, self._instance = self._instance, None
+            await instance.client.close()
+
 qdrant_service = QdrantServiceManager()
\ No newline at end of file
@@ -1,17 +1,40 @@
 from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+import asyncio
+import functools
+import hashlib
+import httpx
 import logging
+import re
+import time
 import uuid
-from datetime import datetime
+import numpy as np
+from pydantic import ValidationError
 from config.settings import settings
 from models.query import QueryRequest, QueryResponse, Citation
 from services.qdrant_service import qdrant_service
 from services.agent_service import agent_service
+from services.semantic_cache import semantic_cache
 from utils.response_quality import response_quality_metrics
 from utils.cache import cache
 import openai  # For embedding generation
 
 logger = logging.getLogger(__name__)
 
+COHERE_EMBED_BATCH_SIZE = 96
+COHERE_EMBEDDING_TYPES = ["int8"]
+MOCK_EMBEDDING_SIZE = 1024
+EMBED_CACHE_SIZE = 4096
+MIN_VALIDATED_ANSWER_LENGTH = 50
+# Same URL forms accepted by the Citation model: absolute http(s) or site-relative
+_URL_RE = re.compile(r"^(?:https?://|/)")
+
+
+def _iso_now() -> str:
+    """Current UTC time as an ISO 8601 string with microseconds and a Z suffix"""
+    seconds, ns = divmod(time.time_ns(), 1_000_000_000)
+    return f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))}.{ns // 1000:06d}Z"
+
 class RAGService:
     def __init__(self):
         # Store service managers (they will be initialized when first used)
@@ -19,12 +42,36 @@ class RAGService:
         self.agent_service_manager = agent_service
         self.openai_client = None
         self.cohere_client = None
+        # Async twins of the clients above, used on the request path
+        self.async_openai_client = None
+        self.async_cohere_client = None
+        # Query embeddings keyed by blake2b(model + text), most recently used last
+        self._embed_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._embed_version = ""
+        # Keep-alive HTTP/2 pools shared by whichever embedding SDK is configured
+        self._http_client: Optional[httpx.Client] = None
+        self._async_http_client: Optional[httpx.AsyncClient] = None
 
         # Try to initialize Cohere client first (as used in retrieve.py)
         if settings.cohere_api_key:
             try:
                 import cohere
-                self.cohere_client = cohere.Client(settings.cohere_api_key)
+                self._init_http_clients()
+                self.cohere_client = cohere.Client(settings.cohere_api_key, httpx_client=self._http_client)
+                self.async_cohere_client = cohere.AsyncClient(
+                    settings.cohere_api_key, httpx_client=self._async_http_client
+                )
+                # Bind the model and input type once per task, so the hot path only passes texts;
+                # Cohere embeds queries and documents differently for asymmetric search
+                cohere_embed_options = {"model": "embed-english-v3.0", "embedding_types": COHERE_EMBEDDING_TYPES}
+                self._cohere_embed = {
+                    input_type: functools.partial(self.cohere_client.embed, input_type=input_type, **cohere_embed_options)
+                    for input_type in ("search_query", "search_document")
+                }
+                self._acohere_embed_query = functools.partial(
+                    self.async_cohere_client.embed, input_type="search_query", **cohere_embed_options
+                )
+                self._embed_version = "cohere/embed-english-v3.0/int8"
                 logger.info("Cohere client initialized for embeddings")
             except ImportError:
                 logger.warning("Cohere library not installed, falling back to other embedding methods")
@@ -33,23 +80,34 @@ class RAGService:
         if not self.cohere_client:
             gemini_api_key = getattr(settings, 'gemini_api_key', None) or getattr(settings, 'openai_api_key', None)
             if gemini_api_key:
+                self._init_http_clients()
                 self.openai_client = openai.OpenAI(
                     api_key=gemini_api_key,
-                    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
+                    base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
+                    http_client=self._http_client
                 )
+                self.async_openai_client = openai.AsyncOpenAI(
+                    api_key=gemini_api_key,
+                    base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
+                    http_client=self._async_http_client
+                )
+                self._embed_version = "openai/text-embedding-004"
                 logger.info("OpenAI client initialized for embeddings via Gemini endpoint")
 
-    def generate_embedding(self, text: str) -> Optional[List[float]]:
+    def _init_http_clients(self):
+        """Create the pooled HTTP/2 clients so embed calls reuse warm connections"""
+        limits = httpx.Limits(max_keepalive_connections=20, max_connections=40)
+        self._http_client = httpx.Client(http2=True, timeout=30.0, limits=limits)
+        self._async_http_client = httpx.AsyncClient(http2=True, timeout=30.0, limits=limits)
+
+    def generate_embedding(self, text: str) -> Optional[np.ndarray]:
         """Generate embedding for the given text using Cohere first, then fallback to OpenAI-compatible endpoint"""
         # Try Cohere first (as used in retrieve.py)
         if self.cohere_client:
             try:
-                response = self.cohere_client.embed(
-                    texts=[text],
-                    model="embed-english-v3.0",  # Using Cohere's latest embedding model
-                    input_type="search_query"
-                )
-                return response.embeddings[0]
+                # int8 embeddings are a quarter of the payload; cosine similarity ignores their scale
+                response = self._cohere_embed["search_query"](texts=[text])
+                return np.asarray(response.embeddings.int8[0], dtype=np.float32)
             except Exception as e:
                 logger.error(f"Error generating embedding with Cohere: {e}")
                 # Continue to try other methods
@@ -61,39 +119,155 @@ class RAGService:
                     input=text,
                     model="text-embedding-004"  # Use Google's embedding model via OpenAI-compatible endpoint
                 )
-                return response.data[0].embedding
+                return np.asarray(response.data[0].embedding, dtype=np.float32)
             except Exception as e:
                 logger.error(f"Error generating embedding with OpenAI-compatible endpoint: {e}")
 
         # Fallback to mock embedding
         logger.warning("No embedding client available, using mock embedding")
         # Qdrant expects 1024 dimensions based on the error, so return that size
-        return [0.0] * 1024  # Size expected by Qdrant
+        return np.zeros(MOCK_EMBEDDING_SIZE, dtype=np.float32)
+
+    async def agenerate_embedding(self, text: str) -> Optional[np.ndarray]:
+        """Async variant of generate_embedding that does not block the event loop"""
+        if self.async_cohere_client:
+            try:
+                response = await self._acohere_embed_query(texts=[text])
+                return np.asarray(response.embeddings.int8[0], dtype=np.float32)
+            except Exception as e:
+                logger.error(f"Error generating embedding with Cohere: {e}")
+
+        if self.async_openai_client:
+            try:
+                response = await self.async_openai_client.embeddings.create(
+                    input=text,
+                    model="text-embedding-004"
+                )
+                return np.asarray(response.data[0].embedding, dtype=np.float32)
+            except Exception as e:
+                logger.error(f"Error generating embedding with OpenAI-compatible endpoint: {e}")
+
+        logger.warning("No embedding client available, using mock embedding")
+        return np.zeros(MOCK_EMBEDDING_SIZE, dtype=np.float32)
+
+    def _embed_cache_key(self, text: str) -> bytes:
+        """LRU key of a query text; the model is part of it so switching providers never serves stale vectors"""
+        return hashlib.blake2b(f"{self._embed_version}\0{text}".encode(), digest_size=16).digest()
+
+    def _remember_embedding(self, key: bytes, embedding: Optional[np.ndarray]):
+        """Store a query embedding in the LRU cache, evicting the least recently used one"""
+        # Mock (zero) embeddings are not worth caching
+        if embedding is not None and embedding.any():
+            embedding.setflags(write=False)
+            self._embed_cache[key] = embedding
+            if len(self._embed_cache) > EMBED_CACHE_SIZE:
+                self._embed_cache.popitem(last=False)
+
+    async def _embed_cached(self, text: str) -> Optional[np.ndarray]:
+        """Return the query embedding from the LRU cache, embedding the text on a miss"""
+        key = self._embed_cache_key(text)
+        embedding = self._embed_cache.get(key)
+        if embedding is not None:
+            self._embed_cache.move_to_end(key)
+            return embedding
+
+        embedding = await self.agenerate_embedding(text)
+        self._remember_embedding(key, embedding)
+        return embedding
+
+    async def _embed_cached_batch(self, texts: List[str]) -> np.ndarray:
+        """Return the query embeddings of several texts as rows, embedding the LRU misses in one request"""
+        keys = [self._embed_cache_key(text) for text in texts]
+        embeddings = [self._embed_cache.get(key) for key in keys]
+        misses = [n for n, embedding in enumerate(embeddings) if embedding is None]
+        for n, embedding in enumerate(embeddings):
+            if embedding is not None:
+                self._embed_cache.move_to_end(keys[n])
+
+        if misses:
+            generated = await asyncio.to_thread(
+                self.generate_embeddings, [texts[n] for n in misses], "search_query"
+            )
+            if not generated or len(generated) != len(misses):
+                raise Exception("Failed to generate query embeddings")
+            for n, embedding in zip(misses, generated):
+                embeddings[n] = np.asarray(embedding, dtype=np.float32)
+                self._remember_embedding(keys[n], embeddings[n])
+
+        return np.stack(embeddings)
+
+    def generate_embeddings(self, texts: List[str], input_type: str = "search_document") -> Optional[List[List[float]]]:
+        """Generate embeddings for a batch of texts in as few requests as possible"""
+        if self.cohere_client:
+            try:
+                embed = self._cohere_embed[input_type]
+                embeddings = []
+                # Cohere accepts up to 96 texts per embed request
+                for start in range(0, len(texts), COHERE_EMBED_BATCH_SIZE):
+                    response = embed(texts=texts[start:start + COHERE_EMBED_BATCH_SIZE])
+                    embeddings.extend(response.embeddings.int8)
+                return embeddings
+            except Exception as e:
+                logger.error(f"Error generating batch embeddings with Cohere: {e}")
+
+        if self.openai_client:
+            try:
+                response = self.openai_client.embeddings.create(
+                    input=texts,
+                    model="text-embedding-004"
+                )
+                return [item.embedding for item in response.data]
+            except Exception as e:
+                logger.error(f"Error generating batch embeddings with OpenAI-compatible endpoint: {e}")
+
+        logger.warning("No embedding client available, using mock embeddings")
+        return [[0.0] * MOCK_EMBEDDING_SIZE for _ in texts]
 
     def validate_citation_links(self, citations: List[Citation]) -> List[Citation]:
         """Validate citation links and clean up any invalid ones"""
-        validated_citations = []
-        for citation in citations:
-            # Basic validation for URL format
-            if citation.url and (citation.url.startswith('http') or citation.url.startswith('/')):
-                validated_citations.append(citation)
-            else:
-                logger.warning(f"Invalid URL in citation: {citation.url}")
+        validated_citations = [c for c in citations if c.url and _URL_RE.match(c.url)]
+        if len(validated_citations) != len(citations):
+            invalid_urls = [c.url for c in citations if not (c.url and _URL_RE.match(c.url))]
+            logger.warning("Invalid URLs in citations: %s", invalid_urls)
         return validated_citations
 
-    def enhance_citation_relevance(self, citations: List[Citation], query: str) -> List[Citation]:
-        """Enhance citation relevance by potentially re-ranking based on query"""
-        # For now, we'll just return the citations as is
-        # In a more advanced implementation, we could re-rank based on semantic similarity
-        # to the original query
+    @staticmethod
+    def _embedding_text(query_request: QueryRequest) -> str:
+        """Text embedded for a query: the query, prefixed by the selected text if provided"""
+        if query_request.selected_text:
+            return f"{query_request.selected_text} {query_request.query}"
+        return query_request.query
+
+    def _build_citations(self, relevant_docs: List[Dict[str, Any]]) -> List[Citation]:
+        """Create validated citations from the retrieved documents"""
+        # Citations are cached and re-validated on every cache hit, so each one is validated
+        # here too; a document that cannot form a valid citation is left out instead of
+        # failing the response (or a later cache hit)
+        citations = []
+        for doc in relevant_docs:
+            try:
+                citations.append(Citation(
+                    document_id=str(doc.get("document_id", "")),
+                    title=doc.get("title", ""),
+                    url=doc.get("url", ""),
+                    text_snippet=doc.get("text_snippet", "")[:500],  # Limit snippet length
+                    # Cosine scores can overshoot 1.0 by float rounding
+                    relevance_score=min(doc.get("relevance_score", 0.0), 1.0)
+                ))
+            except ValidationError as e:
+                logger.warning("Skipping citation for document %s: %s", doc.get("document_id"), e)
+
+        # Citations are already reranked by Qdrant
         return citations
 
-    def query_documentation(self, query_request: QueryRequest) -> QueryResponse:
+    async def query_documentation(self, query_request: QueryRequest) -> QueryResponse:
         """
         Main method to process a query request and return a response with citations
         """
         # Record start time for metrics
         start_time = response_quality_metrics.log_query_start()
+        # One ID per request, reused by whichever response is returned
+        query_id = uuid.uuid4().hex
 
         try:
             # Check cache first
@@ -101,141 +275,286 @@ class RAGService:
             if cached_response:
                 logger.info("Returning cached response")
                 # Update the response with fresh timestamp and new query ID
-                cached_response["query_id"] = str(uuid.uuid4())
-                cached_response["timestamp"] = datetime.utcnow().isoformat() + "Z"
+                cached_response["query_id"] = query_id
+                cached_response["timestamp"] = _iso_now()
 
                 response = QueryResponse(**cached_response)
                 response_quality_metrics.log_query_end(start_time, success=True, response=response)
                 return response
 
-            # Generate embedding for the query
-            query_text = query_request.query
-            if query_request.selected_text:
-                # Combine query with selected text if provided
-                query_text = f"{query_request.selected_text} {query_request.query}"
-
-            query_embedding = self.generate_embedding(query_text)
-            if not query_embedding:
+            query_embedding = await self._embed_cached(self._embedding_text(query_request))
+            if query_embedding is None:
                 raise Exception("Failed to generate query embedding")
 
+            # Normalize the float32 embedding once so cosine distance is a plain dot product
+            norm = np.linalg.norm(query_embedding)
+            if norm > 0:
+                query_embedding = query_embedding / norm
+
+                # Serve paraphrases of an already answered question from the shared query cache
+                response = await self._semantically_cached_response(
+                    query_request, query_embedding, query_id, start_time
+                )
+                if response is not None:
+                    return response
+
             # Search for relevant documents in Qdrant
-            relevant_docs = self.qdrant_service_manager.get_instance().search_documents(
+            relevant_docs = await self.qdrant_service_manager.get_instance().search_documents(
                 query_vector=query_embedding,
                 limit=5  # Get top 5 most relevant documents
             )
 
-            # If no relevant documents found, return appropriate response
-            if not relevant_docs:
-                logger.info("No relevant documents found for query")
-                response = QueryResponse(
-                    answer="I couldn't find any relevant documents to answer your question.",
-                    citations=[],
-                    query_id=str(uuid.uuid4()),
-                    timestamp=datetime.utcnow().isoformat() + "Z"
-                )
-                # Log the failed query
-                response_quality_metrics.log_query_end(start_time, success=False, response=response)
-                return response
+            return await self._answer_from_documents(
+                query_request, query_embedding, norm, relevant_docs, query_id, start_time
+            )
 
-            # Generate response using the agent with retrieved context
-            agent_response = self.agent_service_manager.get_instance().generate_response(
-                query=query_request.query,
-                context=relevant_docs,
-                selected_text=query_request.selected_text
+        except Exception as e:
+            return self._error_response(e, query_id, start_time)
+
+    async def _semantically_cached_response(self, query_request: QueryRequest, query_embedding: np.ndarray,
+                                            query_id: str, start_time: float) -> Optional[QueryResponse]:
+        """Return the query cache's response to a similar, already answered query, if there is one"""
+        cached_response_json = await self.qdrant_service_manager.get_instance().search_cached_response(
+            query_vector=query_embedding,
+            selected_text=query_request.selected_text or "",
+            threshold=settings.cache_similarity_threshold,
+            ttl=settings.query_cache_ttl
+        )
+        if not cached_response_json:
+            return None
+        logger.info("Returning semantically cached response")
+        response = QueryResponse.model_validate_json(cached_response_json)
+        response.query_id = query_id
+        response.timestamp = _iso_now()
+        response_quality_metrics.log_query_end(start_time, success=True, response=response)
+        return response
+
+    async def _answer_from_documents(self, query_request: QueryRequest, query_embedding: np.ndarray,
+                                     norm: float, relevant_docs: List[Dict[str, Any]],
+                                     query_id: str, start_time: float) -> QueryResponse:
+        """Generate, cache and return the response for a query whose documents are retrieved"""
+        # If no relevant documents found, return appropriate response
+        if not relevant_docs:
+            logger.info("No relevant documents found for query")
+            response = QueryResponse(
+                answer="I couldn't find any relevant documents to answer your question.",
+                citations=[],
+                query_id=query_id,
+                timestamp=_iso_now()
             )
+            # Log the failed query
+            response_quality_metrics.log_query_end(start_time, success=False, response=response)
+            return response
 
-            # Create citations from the retrieved documents
-            raw_citations = []
-            for doc in relevant_docs:
-                citation = Citation(
-                    document_id=doc.get("document_id", ""),
-                    title=doc.get("title", ""),
-                    url=doc.get("url", ""),
-                    text_snippet=doc.get("text_snippet", "")[:500],  # Limit snippet length
-                    relevance_score=doc.get("relevance_score", 0.0)
+        # Reuse the answer of a semantically similar query if one is cached
+        semantic_hit = semantic_cache.get(query_embedding)
+        agent_task = None
+        if semantic_hit and semantic_hit["answer"]:
+            logger.info("Returning semantically cached answer")
+            agent_response = {"answer": semantic_hit["answer"]}
+        else:
+            # Generate response using the agent with retrieved context; citations are
+            # assembled below while the LLM call is in flight
+            agent_task = asyncio.create_task(
+                self.agent_service_manager.get_instance().generate_response(
+                    query=query_request.query,
+                    context=relevant_docs,
+                    selected_text=query_request.selected_text
                 )
-                raw_citations.append(citation)
+            )
+            await asyncio.sleep(0)  # Let the agent task send its request first
 
-            # Enhance citation relevance and validate links
-            enhanced_citations = self.enhance_citation_relevance(raw_citations, query_request.query)
-            validated_citations = self.validate_citation_links(enhanced_citations)
+        try:
+            validated_citations = self._build_citations(relevant_docs)
+        except Exception:
+            if agent_task is not None:
+                agent_task.cancel()
+            raise
+
+        if agent_task is not None:
+            agent_response = await agent_task
+            if not agent_response.get("error"):
+                semantic_cache.set(query_embedding, relevant_docs, agent_response["answer"])
+
+        # Create and return the response
+        response = QueryResponse(
+            answer=agent_response["answer"],
+            citations=validated_citations,
+            query_id=query_id,
+            timestamp=_iso_now(),
+            metadata=agent_response.get("metadata", {})
+        )
+
+        # Validate freshly generated, non-trivial answers against the source context; answers
+        # reused from the semantic cache were validated when they were generated
+        if agent_task is not None and response.citations and len(response.answer) > MIN_VALIDATED_ANSWER_LENGTH:
+            response_quality_metrics.validate_response_accuracy(response, relevant_docs)
+
+        # Cache the response (only cache responses that have content)
+        if response.answer and len(response.answer.strip()) > 0:
+            cache.set(
+                query_request.query,
+                response.model_dump(),
+                query_request.selected_text,
+                ttl=7200  # Cache for 2 hours
+            )
+            # Zero (mock) embeddings carry no meaning, so they are never cached semantically
+            if norm > 0:
+                await self.qdrant_service_manager.get_instance().cache_response(
+                    query_vector=query_embedding,
+                    query=query_request.query,
+                    selected_text=query_request.selected_text or "",
+                    response_json=response.model_dump_json()
+                )
 
-            # Generate unique query ID
-            query_id = str(uuid.uuid4())
+        logger.info("Successfully processed query %s", query_id)
+
+        # Log the successful query with metrics
+        response_quality_metrics.log_query_end(start_time, success=True, response=response)
+
+        return response
+
+    def _error_response(self, e: Exception, query_id: str, start_time: float) -> QueryResponse:
+        """Build and record the error response returned when processing a query fails"""
+        logger.error(f"Error processing query: {e}")
+        # Create error response
+        error_response = QueryResponse(
+            answer="Sorry, I encountered an error while processing your request.",
+            citations=[],
+            query_id=query_id,
+            timestamp=_iso_now(),
+            metadata={"error": str(e)}
+        )
+        # Log the failed query
+        response_quality_metrics.log_query_end(start_time, success=False, response=error_response)
+        return error_response
+
+    async def query_documentation_batch(self, query_requests: List[QueryRequest],
+                                        max_concurrency: Optional[int] = None) -> List[QueryResponse]:
+        """
+        Process several queries with one embedding request and one Qdrant batch search,
+        then generate their answers concurrently, at most max_concurrency at a time;
+        exact, embedding and query cache hits are reused as for single queries
+        """
+        start_time = response_quality_metrics.log_query_start()
+        query_ids = [uuid.uuid4().hex for _ in query_requests]
+        responses: List[Optional[QueryResponse]] = [None] * len(query_requests)
 
-            # Create and return the response
-            response = QueryResponse(
-                answer=agent_response["answer"],
-                citations=validated_citations,
-                query_id=query_id,
-                timestamp=datetime.utcnow().isoformat() + "Z",
-                metadata=agent_response.get("metadata", {})
-            )
+        # Answer exact repeats from the cache; only the misses go through the pipeline
+        pending = []
+        for i, query_request in enumerate(query_requests):
+            cached_response = cache.get(query_request.query, query_request.selected_text)
+            if cached_response:
+                cached_response["query_id"] = query_ids[i]
+                cached_response["timestamp"] = _iso_now()
+                responses[i] = QueryResponse(**cached_response)
+                response_quality_metrics.log_query_end(start_time, success=True, response=responses[i])
+            else:
+                pending.append(i)
 
-            # Validate response accuracy against source context
-            validation_result = response_quality_metrics.validate_response_accuracy(response, relevant_docs)
+        if pending:
+            try:
+                # The same embedding LRU and Qdrant query cache as single queries, so a query
+                # answers the same way (and as cheaply) in a batch as on its own
+                query_embeddings = await self._embed_cached_batch(
+                    [self._embedding_text(query_requests[i]) for i in pending]
+                )
+
+                # Normalize every row at once; zero (mock) rows are left as they are
+                norms = np.linalg.norm(query_embeddings, axis=1)
+                query_embeddings = np.divide(query_embeddings, norms[:, np.newaxis],
+                                             out=np.zeros_like(query_embeddings),
+                                             where=norms[:, np.newaxis] > 0)
+
+                # Zero (mock) embeddings are never cached semantically, so only real ones are looked up
+                searched = [n for n in range(len(pending)) if norms[n] > 0]
+                semantic_hits = dict(zip(searched, await asyncio.gather(*(
+                    self._semantically_cached_response(
+                        query_requests[pending[n]], query_embeddings[n], query_ids[pending[n]], start_time
+                    )
+                    for n in searched
+                ))))
+                for n, hit in semantic_hits.items():
+                    if hit is not None:
+                        responses[pending[n]] = hit
+                rows = [n for n in range(len(pending)) if semantic_hits.get(n) is None]
+                pending = [pending[n] for n in rows]
+                query_embeddings, norms = query_embeddings[rows], norms[rows]
+            except Exception as e:
+                for i in pending:
+                    responses[i] = self._error_response(e, query_ids[i], start_time)
+                pending = []
 
-            # Cache the response (only cache responses that have content)
-            if response.answer and len(response.answer.strip()) > 0:
-                cache.set(
-                    query_request.query,
-                    response.model_dump(),
-                    query_request.selected_text,
-                    ttl=7200  # Cache for 2 hours
+        if pending:
+            try:
+                docs_per_query = await self.qdrant_service_manager.get_instance().search_documents_batch(
+                    query_vectors=query_embeddings,
+                    limit=5
                 )
+                semaphore = asyncio.Semaphore(max_concurrency or len(pending))
 
-            logger.info(f"Successfully processed query {query_id}")
+                async def answer(n: int, i: int) -> QueryResponse:
+                    async with semaphore:
+                        return await self._answer_from_documents(
+                            query_requests[i], query_embeddings[n], norms[n], docs_per_query[n],
+                            query_ids[i], start_time
+                        )
 
-            # Log the successful query with metrics
-            response_quality_metrics.log_query_end(start_time, success=True, response=response)
+                answers = await asyncio.gather(
+                    *(answer(n, i) for n, i in enumerate(pending)), return_exceptions=True
+                )
+            except Exception as e:
+                answers = [e] * len(pending)
 
-            return response
+            for i, answer in zip(pending, answers):
+                responses[i] = (
+                    self._error_response(answer, query_ids[i], start_time)
+                    if isinstance(answer, BaseException) else answer
+                )
 
-        except Exception as e:
-            logger.error(f"Error processing query: {e}")
-            # Create error response
-            error_response = QueryResponse(
-                answer="Sorry, I encountered an error while processing your request.",
-                citations=[],
-                query_id=str(uuid.uuid4()),
-                timestamp=datetime.utcnow().isoformat() + "Z",
-                metadata={"error": str(e)}
-            )
-            # Log the failed query
-            response_quality_metrics.log_query_end(start_time, success=False, response=error_response)
-            return error_response
+        return responses
 
-    def add_document_to_index(self, content: str, title: str, url: str,
+    async def add_document_to_index(self, content: str, title: str, url: str,
                              metadata: Optional[Dict[str, Any]] = None) -> bool:
         """Add a document to the Qdrant index"""
+        return await self.add_documents_to_index([
+            {"content": content, "title": title, "url": url, "metadata": metadata}
+        ])
+
+    async def add_documents_to_index(self, docs: List[Dict[str, Any]]) -> bool:
+        """Add documents to the Qdrant index with one embedding request and one upsert"""
         try:
-            # Generate embedding for the document content
-            embedding = self.generate_embedding(content)
-            if not embedding:
-                logger.error("Failed to generate embedding for document")
+            # Generate embeddings for all document contents at once
+            embeddings = await asyncio.to_thread(
+                self.generate_embeddings, [doc["content"] for doc in docs]
+            )
+            if not embeddings or len(embeddings) != len(docs):
+                logger.error("Failed to generate embeddings for documents")
                 return False
 
-            # Generate document ID
-            doc_id = str(uuid.uuid4())
-
-            # Add to Qdrant
-            success = self.qdrant_service_manager.get_instance().add_document(
-                document_id=doc_id,
-                content=content,
-                title=title,
-                url=url,
-                embedding=embedding,
-                metadata=metadata
-            )
+            documents = [
+                {
+                    "document_id": str(uuid.uuid4()),
+                    "content": doc["content"],
+                    "title": doc["title"],
+                    "url": doc["url"],
+                    "embedding": embedding,
+                    "metadata": doc.get("metadata") or {}
+                }
+                for doc, embedding in zip(docs, embeddings)
+            ]
+
+            # Add to Qdrant in a single upsert
+            success = await self.qdrant_service_manager.get_instance().batch_add_documents(documents)
 
             if success:
-                logger.info(f"Successfully added document {doc_id} to index")
+                logger.info(f"Successfully added {len(documents)} documents to index")
             else:
-                logger.error(f"Failed to add document {doc_id} to index")
+                logger.error(f"Failed to add {len(documents)} documents to index")
 
             return success
         except Exception as e:
-            logger.error(f"Error adding document to index: {e}")
+            logger.error(f"Error adding documents to index: {e}")
             return False
 
 # Create a singleton instance with lazy initialization
@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+import logging
+import time
+import numpy as np
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class SemanticCache:
+    """
+    Embedding-similarity cache backed by a random-projection LSH index.
+    Near-duplicate queries reuse the previously retrieved context (and answer)
+    instead of paying another Qdrant round-trip and LLM call.
+    """
+
+    def __init__(self, num_planes: int = 16, num_tables: int = 4, max_entries: int = 1024,
+                 threshold: float = settings.cache_similarity_threshold, seed: int = 42,
+                 ttl: int = settings.semantic_cache_ttl):
+        self.num_planes = num_planes  # Bits per signature (<= 64 so it packs into a uint64)
+        self.num_tables = num_tables
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.seed = seed
+        self.ttl = ttl  # Seconds an entry is served before it must be retrieved again
+
+        # Hyperplanes are created on first use since the embedding size depends on the provider
+        self.planes: Optional[np.ndarray] = None
+        self.bit_weights = np.left_shift(np.uint64(1), np.arange(num_planes, dtype=np.uint64))
+
+        # entry id -> {"vector", "results", "answer", "signatures", "expiry"}
+        self.entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.tables: List[Dict[bytes, List[int]]] = [{} for _ in range(num_tables)]
+        self._next_id = 0
+
+    def _normalize(self, query_vec: List[float]) -> Optional[np.ndarray]:
+        """L2-normalize the query vector; zero vectors (e.g. mock embeddings) are not cacheable"""
+        vec = np.asarray(query_vec, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm == 0:
+            return None
+        return vec / norm
+
+    def _signatures(self, vec: np.ndarray) -> List[bytes]:
+        """Hash the normalized vector into one k-bit signature per table"""
+        if self.planes is None or self.planes.shape[1] != vec.shape[0]:
+            rng = np.random.default_rng(self.seed)
+            self.planes = rng.standard_normal(
+                (self.num_tables, vec.shape[0], self.num_planes)
+            ).astype(np.float32)
+            self._reset_index()
+
+        bits = ((vec @ self.planes) > 0).astype(np.uint64)
+        packed = bits @ self.bit_weights
+        return [sig.tobytes() for sig in packed]
+
+    def _reset_index(self):
+        self.entries.clear()
+        self.tables = [{} for _ in range(self.num_tables)]
+
+    def _find(self, vec: np.ndarray, signatures: List[bytes], threshold: float) -> Optional[int]:
+        """Probe the matching buckets and return the most similar entry id above the threshold"""
+        candidates = set()
+        for table, signature in zip(self.tables, signatures):
+            candidates.update(table.get(signature, ()))
+
+        if not candidates:
+            return None
+
+        # Expired entries are dropped here rather than served
+        now = time.time()
+        for entry_id in [entry_id for entry_id in candidates if self.entries[entry_id]["expiry"] <= now]:
+            self._remove(entry_id)
+            candidates.discard(entry_id)
+        if not candidates:
+            return None
+
+        # Score every candidate with one contiguous matrix-vector product
+        candidate_ids = list(candidates)
+        vectors = np.stack([self.entries[entry_id]["vector"] for entry_id in candidate_ids])
+        scores = vectors @ vec
+        best = int(np.argmax(scores))
+        if scores[best] < threshold:
+            return None
+        return candidate_ids[best]
+
+    def get(self, query_vec: List[float], threshold: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Return the cached {"results", "answer"} for a semantically similar query, if any"""
+        vec = self._normalize(query_vec)
+        if vec is None:
+            return None
+
+        entry_id = self._find(vec, self._signatures(vec), self.threshold if threshold is None else threshold)
+        if entry_id is None:
+            return None
+
+        self.entries.move_to_end(entry_id)
+        entry = self.entries[entry_id]
+        logger.info("Semantic cache hit")
+        return {"results": entry["results"], "answer": entry["answer"]}
+
+    def set(self, query_vec: List[float], result: List[Dict[str, Any]], answer: Optional[str] = None) -> None:
+        """Store the retrieved context (and optional answer), updating a near-duplicate entry if present"""
+        vec = self._normalize(query_vec)
+        if vec is None:
+            return
+
+        signatures = self._signatures(vec)
+        entry_id = self._find(vec, signatures, self.threshold)
+        if entry_id is not None:
+            entry = self.entries[entry_id]
+            if result is not entry["results"]:
+                # New results restart the entry's lifetime; an answer alone does not
+                entry["expiry"] = time.time() + self.ttl
+            entry["results"] = result
+            if answer is not None:
+                entry["answer"] = answer
+            self.entries.move_to_end(entry_id)
+            return
+
+        if len(self.entries) >= self.max_entries:
+            self._evict_oldest()
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self.entries[entry_id] = {
+            "vector": vec,
+            "results": result,
+            "answer": answer,
+            "signatures": signatures,
+            "expiry": time.time() + self.ttl
+        }
+        for table, signature in zip(self.tables, signatures):
+            table.setdefault(signature, []).append(entry_id)
+
+    def _evict_oldest(self):
+        self._remove(next(iter(self.entries)))
+
+    def _remove(self, entry_id: int):
+        entry = self.entries.pop(entry_id)
+        for table, signature in zip(self.tables, entry["signatures"]):
+            bucket = table.get(signature)
+            if bucket:
+                bucket.remove(entry_id)
+                if not bucket:
+                    del table[signature]
+
+    def clear(self) -> None:
+        """Clear all items from the semantic cache"""
+        self._reset_index()
+        logger.info("Semantic cache cleared")
+
+    def size(self) -> int:
+        """Get the number of items in the semantic cache"""
+        return len(self.entries)
+
+# Create a singleton instance
+semantic_cache = SemanticCache()
@@ -3,10 +3,10 @@
 Script to add test content to the Qdrant database
 """
 
-import uuid
+import asyncio
 from services.rag_service import rag_service
 
-def add_test_documents():
+async def add_test_documents():
     """Add some test documents to the Qdrant database"""
 
     # Test documents about robotics and AI
@@ -40,21 +40,14 @@ def add_test_documents():
 
     print("Adding test documents to Qdrant database...")
 
-    success_count = 0
-    for i, doc in enumerate(test_documents, 1):
-        print(f"Adding document {i}: {doc['title']}")
-
-        success = rag_service.add_document_to_index(
-            content=doc['content'],
-            title=doc['title'],
-            url=doc['url']
-        )
+    # Embed and upsert all documents in one batch
+    success = await rag_service.get_instance().add_documents_to_index(test_documents)
 
-        if success:
-            success_count += 1
-            print(f"  [SUCCESS] Successfully added")
-        else:
-            print(f"  [FAILED] Failed to add")
+    status = "[SUCCESS] Successfully added" if success else "[FAILED] Failed to add"
+    for i, doc in enumerate(test_documents, 1):
+        print(f"Document {i}: {doc['title']}")
+        print(f"  {status}")
+    success_count = len(test_documents) if success else 0
 
     print(f"\nSuccessfully added {success_count} out of {len(test_documents)} documents.")
 
@@ -67,4 +60,4 @@ def add_test_documents():
         print("\nUse: python retrieve.py --query 'your question here'")
 
 if __name__ == "__main__":
-    add_test_documents()
\ No newline at end of file
+    asyncio.run(add_test_documents())
\ No newline at end of file
@@ -305,7 +305,7 @@ class QdrantRetriever:
 
     def retrieve_chunks(self, query_text: str, top_k: int = 5) -> List[RetrievedChunk]:
         """Retrieve relevant content chunks from Qdrant based on query embeddings"""
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         try:
             # Generate embedding for the query
@@ -337,7 +337,7 @@ class QdrantRetriever:
                     )
                     retrieved_chunks.append(chunk)
 
-            search_time = (time.time() - start_time) * 1000  # Convert to milliseconds
+            search_time = (time.perf_counter() - start_time) * 1000  # Convert to milliseconds
             self.logger.info(f"Retrieved {len(retrieved_chunks)} chunks in {search_time:.2f}ms")
 
             return retrieved_chunks
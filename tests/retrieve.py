@@ -10,8 +10,13 @@ This module provides functionality to:
 """
 
 import os
+import hashlib
 import logging
+import re
+import sqlite3
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Any
 from dataclasses import dataclass
 from dotenv import load_dotenv
@@ -27,8 +32,32 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-
-@dataclass
+EMBED_MODEL = "embed-english-v3.0"
+# Candidates prefetched per requested result before the final rerank
+PREFETCH_FACTOR = 4
+VALIDATION_WORKERS = 8
+
+# Fixed accuracy checks run by run_pipeline_validation
+_BUILTIN_QUERIES = [
+    {
+        "query": "What is the ROS 2 architecture?",
+        "expected_content": ["ROS 2", "DDS", "middleware", "nodes"],
+        "top_k": 5
+    },
+    {
+        "query": "Explain Gazebo simulation environment",
+        "expected_content": ["Gazebo", "simulation", "physics", "robot"],
+        "top_k": 5
+    },
+    {
+        "query": "How does NVIDIA Isaac work?",
+        "expected_content": ["Isaac", "NVIDIA", "AI", "robotics"],
+        "top_k": 5
+    }
+]
+
+
+@dataclass(slots=True)
 class QueryRequest:
     """Data class for query request"""
     query_text: str
@@ -36,7 +65,7 @@ class QueryRequest:
     top_k: int = 5
 
 
-@dataclass
+@dataclass(slots=True)
 class RetrievedChunk:
     """Data class for retrieved content chunk"""
     content: str
@@ -45,7 +74,7 @@ class RetrievedChunk:
     metadata: Dict[str, Any]
 
 
-@dataclass
+@dataclass(slots=True)
 class RetrievalResult:
     """Data class for retrieval results"""
     query: QueryRequest
@@ -53,9 +82,18 @@ class RetrievalResult:
     search_time_ms: float
     total_candidates: int
     validated: bool = False
+    count_filter: Optional[models.Filter] = None
+
+    def fetch_total_candidates(self, client: QdrantClient, collection_name: str) -> int:
+        """Count every point matching the query filters (a separate Qdrant round-trip)"""
+        self.total_candidates = client.count(
+            collection_name=collection_name,
+            count_filter=self.count_filter
+        ).count
+        return self.total_candidates
 
 
-@dataclass
+@dataclass(slots=True)
 class ValidationResult:
     """Data class for validation results"""
     test_name: str
@@ -67,6 +105,99 @@ class ValidationResult:
     success: bool
 
 
+class EmbeddingCache:
+    """Persistent content-addressed cache of embeddings keyed by model, input type and text"""
+
+    def __init__(self, path: str, ttl_seconds: int = 86400 * 30):
+        self.ttl_seconds = ttl_seconds
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB, created_at INT)"
+        )
+
+    @staticmethod
+    def make_key(model: str, input_type: str, text: str) -> bytes:
+        return hashlib.blake2b(f"{model}\0{input_type}\0{text}".encode(), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        row = self.connection.execute(
+            "SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def set(self, key: bytes, vector: np.ndarray) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                (key, vector.tobytes(), int(time.time()))
+            )
+
+
+def _str_condition(key: str, value: str) -> models.FieldCondition:
+    return models.FieldCondition(key=key, match=models.MatchValue(value=value))
+
+
+def _list_condition(key: str, value: list) -> models.FieldCondition:
+    # A list of values is an OR condition; MatchAny evaluates it as one condition server-side
+    return models.FieldCondition(key=key, match=models.MatchAny(any=value))
+
+
+def _default_condition(key: str, value: Any) -> models.FieldCondition:
+    # Handle other types
+    return models.FieldCondition(key=key, match=models.MatchValue(value=str(value)))
+
+
+_FILTER_CONDITION_BUILDERS = {
+    str: _str_condition,
+    list: _list_condition,
+}
+
+
+class QueryVectorCache:
+    """Bounded cache of recent (query vector, results) pairs served by cosine similarity.
+    Query vectors are expected to be unit-norm already (see RAGValidator.embed_queries)."""
+
+    def __init__(self, capacity: int = 1000, threshold: float = 0.97):
+        self.capacity = capacity
+        self.threshold = threshold
+        # Unit-norm query vectors, one row per slot; allocated once the dimension is known
+        self.vectors: Optional[np.ndarray] = None
+        self.entries: List[Any] = []
+        self._next_slot = 0
+        # Validation queries run on a thread pool and share this cache
+        self._lock = threading.Lock()
+
+    def get(self, query_vector: np.ndarray, match_key: Any) -> Optional[Any]:
+        """Return the cached value of the most similar query with the same match key"""
+        vector = np.asarray(query_vector, dtype=np.float32)
+        with self._lock:
+            if not self.entries or vector.shape[0] != self.vectors.shape[1]:
+                return None
+            sims = self.vectors[:len(self.entries)] @ vector
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold or self.entries[best][0] != match_key:
+                return None
+            return self.entries[best][1]
+
+    def set(self, query_vector: np.ndarray, match_key: Any, value: Any) -> None:
+        """Insert a value, evicting the oldest entry once the cache is full"""
+        vector = np.asarray(query_vector, dtype=np.float32)
+        with self._lock:
+            if self.vectors is None or vector.shape[0] != self.vectors.shape[1]:
+                self.vectors = np.empty((self.capacity, vector.shape[0]), dtype=np.float32)
+                self.entries = []
+                self._next_slot = 0
+
+            self.vectors[self._next_slot] = vector
+            if self._next_slot < len(self.entries):
+                self.entries[self._next_slot] = (match_key, value)
+            else:
+                self.entries.append((match_key, value))
+            self._next_slot = (self._next_slot + 1) % self.capacity
+
+
 class RAGValidator:
     """Main class for RAG pipeline validation"""
 
@@ -74,24 +205,36 @@ class RAGValidator:
         # Initialize Cohere client
         self.cohere_client = cohere.Client(os.getenv("COHERE_API_KEY"))
 
+        # Repeated validation runs reuse query embeddings instead of calling Cohere again
+        self._embed_cache = EmbeddingCache(os.getenv("EMBED_CACHE_PATH", ".embedcache.db"))
+        self._builtin_query_vectors: Optional[List[np.ndarray]] = None
+        # Near-identical queries reuse recent search results instead of another Qdrant search
+        self._qv_cache = QueryVectorCache()
+
         # Initialize Qdrant client - handle both cloud and local instances
         qdrant_url = os.getenv("QDRANT_URL")
         qdrant_host = os.getenv("QDRANT_HOST")
         qdrant_port = os.getenv("QDRANT_PORT")
         qdrant_api_key = os.getenv("QDRANT_API_KEY")
+        # gRPC sends query vectors as protobuf instead of JSON
+        qdrant_grpc_port = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
 
         if qdrant_url:
             # Use cloud instance
             self.qdrant_client = QdrantClient(
                 url=qdrant_url,
                 api_key=qdrant_api_key,
-                https=True
+                https=True,
+                prefer_grpc=True,
+                grpc_port=qdrant_grpc_port
             )
         else:
             # Use local instance
             self.qdrant_client = QdrantClient(
                 host=qdrant_host or "localhost",
-                port=int(qdrant_port or 6333)
+                port=int(qdrant_port or 6333),
+                prefer_grpc=True,
+                grpc_port=qdrant_grpc_port
             )
 
         # Get collection name from environment
@@ -106,66 +249,95 @@ class RAGValidator:
             else:
                 raise ValueError("No collection found in Qdrant and COLLECTION_NAME not set")
 
+        # Collection schema, loaded on first use
+        self._schema: Optional[Dict[str, Any]] = None
+
         logger.info(f"Initialized RAGValidator for collection: {self.collection_name}")
 
     def load_collection_schema(self) -> Dict[str, Any]:
-        """Load and return the schema of the existing Qdrant collection"""
+        """Return the schema of the existing Qdrant collection, fetched once per validator"""
+        if self._schema is None:
+            self._schema = self.refresh_schema()
+        return self._schema
+
+    def refresh_schema(self) -> Dict[str, Any]:
+        """Fetch the collection schema (including a fresh point count) from Qdrant"""
         try:
             collection_info = self.qdrant_client.get_collection(self.collection_name)
-            return {
+            self._schema = {
                 "name": collection_info.config.params.vectors.size,
                 "vector_size": collection_info.config.params.vectors.size,
                 "distance": collection_info.config.params.vectors.distance,
                 "count": collection_info.points_count
             }
+            return self._schema
         except Exception as e:
             logger.error(f"Error loading collection schema: {e}")
             raise
 
-    def embed_query(self, query_text: str) -> List[float]:
-        """Embed the query text using Cohere"""
+    def optimize_collection(self) -> None:
+        """
+        Move the original vectors to disk and keep int8 quantized copies in RAM.
+        Collections that already have a quantization config (e.g. binary) are left as they are.
+        """
+        collection_info = self.qdrant_client.get_collection(self.collection_name)
+        if collection_info.config.quantization_config is not None:
+            logger.info(f"Collection {self.collection_name} is already quantized; skipping")
+            return
+
+        self.qdrant_client.update_collection(
+            collection_name=self.collection_name,
+            vectors_config={"": models.VectorParamsDiff(on_disk=True)},
+            quantization_config=models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True
+                )
+            )
+        )
+        logger.info(f"Enabled int8 scalar quantization for collection {self.collection_name}")
+
+    def embed_query(self, query_text: str) -> np.ndarray:
+        """Embed the query text using Cohere, as a float32 array qdrant-client can send as-is"""
+        return self.embed_queries([query_text])[0]
+
+    def embed_queries(self, query_texts: List[str]) -> List[np.ndarray]:
+        """Embed several query texts, sending only cache misses to Cohere in a single request"""
+        # Vectors are cached unit-norm; the key tag keeps older un-normalized rows from being served
+        keys = [EmbeddingCache.make_key(EMBED_MODEL, "search_query/unit", text) for text in query_texts]
+        vectors = [self._embed_cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if not missing:
+            return vectors
+
         try:
             response = self.cohere_client.embed(
-                texts=[query_text],
-                model="embed-english-v3.0",  # Using Cohere's latest embedding model
+                texts=[query_texts[i] for i in missing],
+                model=EMBED_MODEL,  # Using Cohere's latest embedding model
                 input_type="search_query"
             )
-            return response.embeddings[0]
         except Exception as e:
-            logger.error(f"Error embedding query: {e}")
+            logger.error(f"Error embedding queries: {e}")
             raise
 
+        for i, embedding in zip(missing, response.embeddings):
+            vector = np.asarray(embedding, dtype=np.float32)
+            # Normalize once here so cosine lookups downstream are plain dot products
+            vector /= np.linalg.norm(vector) + 1e-12
+            vectors[i] = vector
+            self._embed_cache.set(keys[i], vectors[i])
+        return vectors
+
     def _convert_filters_to_qdrant(self, filters: Optional[Dict]) -> Optional[models.Filter]:
         """Convert simple dict filters to Qdrant filter format"""
         if not filters:
             return None
 
-        conditions = []
-        for key, value in filters.items():
-            if isinstance(value, str):
-                conditions.append(
-                    models.FieldCondition(
-                        key=key,
-                        match=models.MatchValue(value=value)
-                    )
-                )
-            elif isinstance(value, list):
-                # Handle list of values (OR condition)
-                or_conditions = [
-                    models.FieldCondition(
-                        key=key,
-                        match=models.MatchValue(value=v)
-                    ) for v in value
-                ]
-                conditions.append(models.Should(conditions=or_conditions))
-            else:
-                # Handle other types
-                conditions.append(
-                    models.FieldCondition(
-                        key=key,
-                        match=models.MatchValue(value=str(value))
-                    )
-                )
+        conditions = [
+            _FILTER_CONDITION_BUILDERS.get(type(value), _default_condition)(key, value)
+            for key, value in filters.items()
+        ]
 
         if conditions:
             return models.Filter(must=conditions)
@@ -173,44 +345,85 @@ class RAGValidator:
 
     def retrieve(self, query_request: QueryRequest) -> RetrievalResult:
         """Perform semantic retrieval from Qdrant"""
-        start_time = time.time()
+        start_time = time.perf_counter()
+
+        # Embed the query
+        query_vector = self.embed_query(query_request.query_text)
+
+        return self.retrieve_with_vector(query_vector, query_request, start_time)
+
+    def retrieve_with_vector(self, query_vector: np.ndarray, query_request: QueryRequest,
+                             start_time: Optional[float] = None) -> RetrievalResult:
+        """Perform semantic retrieval from Qdrant with an already embedded query"""
+        if start_time is None:
+            start_time = time.perf_counter()
 
         try:
-            # Embed the query
-            query_vector = self.embed_query(query_request.query_text)
+            # Serve semantically near-identical queries with the same filters from the cache
+            cache_key = (repr(query_request.filters), query_request.top_k)
+            cached = self._qv_cache.get(query_vector, cache_key)
+            if cached is not None:
+                retrieved_chunks, total_candidates, qdrant_filters = cached
+                search_time = (time.perf_counter() - start_time) * 1000
+                logger.info(f"Served {len(retrieved_chunks)} cached results in {search_time:.2f}ms")
+                return RetrievalResult(
+                    query=query_request,
+                    results=retrieved_chunks,
+                    search_time_ms=search_time,
+                    total_candidates=total_candidates,
+                    count_filter=qdrant_filters
+                )
 
             # Convert filters to Qdrant format
             qdrant_filters = self._convert_filters_to_qdrant(query_request.filters)
 
-            # Perform search using search method (compatible with older Qdrant client versions)
-            search_results = self.qdrant_client.search(
+            # Oversample the filtered candidates, then rerank them in the same round-trip
+            search_results = self.qdrant_client.query_points(
                 collection_name=self.collection_name,
-                query_vector=query_vector,
+                prefetch=[
+                    models.Prefetch(
+                        query=query_vector,
+                        filter=qdrant_filters,
+                        limit=query_request.top_k * PREFETCH_FACTOR,
+                        # The ANN stage runs on the quantized vectors (if any)...
+                        params=models.SearchParams(
+                            hnsw_ef=128,
+                            quantization=models.QuantizationSearchParams(ignore=False, rescore=False)
+                        )
+                    )
+                ],
+                query=query_vector,
                 query_filter=qdrant_filters,
                 limit=query_request.top_k,
+                # ...and the oversampled candidates are rescored at full precision to preserve recall
+                search_params=models.SearchParams(
+                    quantization=models.QuantizationSearchParams(ignore=True)
+                ),
                 with_payload=True,
                 with_vectors=False
             )
 
             # Convert results to our format
-            retrieved_chunks = []
-            for result in search_results:  # For older search method, iterate directly
-                chunk = RetrievedChunk(
-                    content=result.payload.get("content", "") if result.payload else "",
+            retrieved_chunks = [
+                RetrievedChunk(
+                    content=payload.get("content", ""),
                     id=str(result.id),
-                    score=result.score if result.score else 0.0,  # Score might be None for exact matches
-                    metadata=result.payload if result.payload else {}
+                    score=result.score or 0.0,  # Score might be None for exact matches
+                    metadata=payload
                 )
-                retrieved_chunks.append(chunk)
+                for result in search_results.points
+                for payload in (result.payload or {},)
+            ]
 
             # Calculate search time
-            search_time = (time.time() - start_time) * 1000  # Convert to milliseconds
+            search_time = (time.perf_counter() - start_time) * 1000  # Convert to milliseconds
 
-            # Get total candidate count
-            total_candidates = self.qdrant_client.count(
-                collection_name=self.collection_name,
-                count_filter=qdrant_filters
-            ).count
+            # The true candidate count costs another round-trip; callers that need it
+            # use RetrievalResult.fetch_total_candidates
+            total_candidates = len(retrieved_chunks)
+
+            # The filter is cached too so fetch_total_candidates counts the same subset
+            self._qv_cache.set(query_vector, cache_key, (retrieved_chunks, total_candidates, qdrant_filters))
 
             logger.info(f"Retrieved {len(retrieved_chunks)} results in {search_time:.2f}ms")
 
@@ -218,7 +431,8 @@ class RAGValidator:
                 query=query_request,
                 results=retrieved_chunks,
                 search_time_ms=search_time,
-                total_candidates=total_candidates
+                total_candidates=total_candidates,
+                count_filter=qdrant_filters
             )
 
         except Exception as e:
@@ -235,56 +449,63 @@ class RAGValidator:
             logger.info(f"     Content preview: {chunk.content[:100]}...")
             logger.info(f"     Metadata: {chunk.metadata}")
 
-    def validate_retrieval_accuracy(self, test_queries: List[Dict[str, Any]]) -> List[ValidationResult]:
-        """Validate retrieval accuracy with test queries"""
-        validation_results = []
-
-        for test_query in test_queries:
-            query_text = test_query["query"]
-            expected_content = test_query["expected_content"]
-            filters = test_query.get("filters", None)
-            top_k = test_query.get("top_k", 5)
-
-            # Perform retrieval
-            query_req = QueryRequest(query_text=query_text, filters=filters, top_k=top_k)
-            retrieval_result = self.retrieve(query_req)
-
-            # Calculate precision and recall
-            relevant_retrieved = 0
-            total_retrieved = len(retrieval_result.results)
-
-            for chunk in retrieval_result.results:
-                # Check if any expected content appears in the retrieved chunk
-                for expected in expected_content:
-                    if expected.lower() in chunk.content.lower():
-                        relevant_retrieved += 1
-                        break
-
-            # Calculate precision
-            precision = relevant_retrieved / total_retrieved if total_retrieved > 0 else 0
-
-            # Calculate recall (how many relevant items were retrieved out of all relevant items)
-            # For simplicity, we'll consider this as the ratio of relevant items retrieved
-            recall = relevant_retrieved / len(expected_content) if len(expected_content) > 0 else 0
-
-            # Determine success based on thresholds (85% precision as per spec)
-            success = precision >= 0.85
-
-            validation_result = ValidationResult(
-                test_name=f"accuracy_test_{query_text[:20]}",
-                query=query_text,
-                expected_results=expected_content,
-                actual_results=retrieval_result.results,
-                precision=precision,
-                recall=recall,
-                success=success
-            )
+    def validate_retrieval_accuracy(self, test_queries: List[Dict[str, Any]],
+                                    query_vectors: Optional[List[np.ndarray]] = None) -> List[ValidationResult]:
+        """Validate retrieval accuracy with test queries, optionally with precomputed query vectors"""
+        # Embed every test query in one request instead of one round-trip per query
+        if query_vectors is None:
+            query_vectors = self.embed_queries([test_query["query"] for test_query in test_queries])
+
+        # Each validation is independent and I/O-bound, so overlap their Qdrant round-trips
+        with ThreadPoolExecutor(max_workers=VALIDATION_WORKERS) as executor:
+            return list(executor.map(self._run_single_validation, test_queries, query_vectors))
+
+    def _run_single_validation(self, test_query: Dict[str, Any], query_vector: np.ndarray) -> ValidationResult:
+        """Retrieve for one test query and score the results against its expected content"""
+        query_text = test_query["query"]
+        expected_content = test_query["expected_content"]
+        filters = test_query.get("filters", None)
+        top_k = test_query.get("top_k", 5)
+
+        # Perform retrieval
+        query_req = QueryRequest(query_text=query_text, filters=filters, top_k=top_k)
+        retrieval_result = self.retrieve_with_vector(query_vector, query_req)
 
-            validation_results.append(validation_result)
+        # Calculate precision and recall
+        total_retrieved = len(retrieval_result.results)
 
-            logger.info(f"Validation for '{query_text[:30]}...': Precision={precision:.2f}, Recall={recall:.2f}, Success={success}")
+        # A chunk is relevant if any expected term appears in it; one regex alternation
+        # scans each casefolded chunk once instead of re-folding it per expected term
+        expected_pattern = re.compile("|".join(re.escape(e.casefold()) for e in expected_content)) \
+            if expected_content else None
+        relevant_retrieved = sum(
+            1 for chunk in retrieval_result.results
+            if expected_pattern.search(chunk.content.casefold())
+        ) if expected_pattern else 0
 
-        return validation_results
+        # Calculate precision
+        precision = relevant_retrieved / total_retrieved if total_retrieved > 0 else 0
+
+        # Calculate recall (how many relevant items were retrieved out of all relevant items)
+        # For simplicity, we'll consider this as the ratio of relevant items retrieved
+        recall = relevant_retrieved / len(expected_content) if len(expected_content) > 0 else 0
+
+        # Determine success based on thresholds (85% precision as per spec)
+        success = precision >= 0.85
+
+        validation_result = ValidationResult(
+            test_name=f"accuracy_test_{query_text[:20]}",
+            query=query_text,
+            expected_results=expected_content,
+            actual_results=retrieval_result.results,
+            precision=precision,
+            recall=recall,
+            success=success
+        )
+
+        logger.info(f"Validation for '{query_text[:30]}...': Precision={precision:.2f}, Recall={recall:.2f}, Success={success}")
+
+        return validation_result
 
     def run_pipeline_validation(self) -> Dict[str, Any]:
         """Run comprehensive pipeline validation"""
@@ -294,26 +515,10 @@ class RAGValidator:
         schema = self.load_collection_schema()
         logger.info(f"Collection schema: {schema}")
 
-        # Run accuracy tests
-        test_queries = [
-            {
-                "query": "What is the ROS 2 architecture?",
-                "expected_content": ["ROS 2", "DDS", "middleware", "nodes"],
-                "top_k": 5
-            },
-            {
-                "query": "Explain Gazebo simulation environment",
-                "expected_content": ["Gazebo", "simulation", "physics", "robot"],
-                "top_k": 5
-            },
-            {
-                "query": "How does NVIDIA Isaac work?",
-                "expected_content": ["Isaac", "NVIDIA", "AI", "robotics"],
-                "top_k": 5
-            }
-        ]
-
-        validation_results = self.validate_retrieval_accuracy(test_queries)
+        # Run accuracy tests; the built-in queries never change, so embed them once per process
+        if self._builtin_query_vectors is None:
+            self._builtin_query_vectors = self.embed_queries([q["query"] for q in _BUILTIN_QUERIES])
+        validation_results = self.validate_retrieval_accuracy(_BUILTIN_QUERIES, self._builtin_query_vectors)
 
         # Calculate overall metrics
         total_tests = len(validation_results)
@@ -337,6 +542,18 @@ class RAGValidator:
         return results
 
 
+# Shared validator so every caller reuses the same Cohere and Qdrant connections
+_validator: Optional[RAGValidator] = None
+
+
+def get_validator() -> RAGValidator:
+    """Return the shared RAGValidator, creating it on first use"""
+    global _validator
+    if _validator is None:
+        _validator = RAGValidator()
+    return _validator
+
+
 def main():
     """Main function to demonstrate usage"""
     import argparse
@@ -345,11 +562,16 @@ def main():
     parser.add_argument("--query", type=str, help="Query to test retrieval")
     parser.add_argument("--validate", action="store_true", help="Run validation tests")
     parser.add_argument("--filters", type=str, help="JSON string of filters")
+    parser.add_argument("--optimize", action="store_true",
+                        help="Enable int8 quantization with on-disk vectors for the collection")
 
     args = parser.parse_args()
 
     # Initialize validator
-    validator = RAGValidator()
+    validator = get_validator()
+
+    if args.optimize:
+        validator.optimize_collection()
 
     if args.validate:
         # Run comprehensive validation
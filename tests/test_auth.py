@@ -9,7 +9,7 @@ import os
 sys.path.insert(0, os.path.abspath('.'))
 
 from utils.auth import verify_api_key, validate_api_key_in_header
-from utils.rate_limit import rate_limiter
+from utils.rate_limit import rate_limiter, concurrency_limiter
 from config.settings import settings
 
 def test_api_key_validation():
@@ -30,6 +30,11 @@ def test_api_key_validation():
     except Exception as e:
         print(f"Invalid API key validation failed: {e}")
 
+    # Test with a missing API key header
+    is_valid = validate_api_key_in_header(None)
+    print(f"Missing API key validation: {'PASS' if not is_valid else 'FAIL'}")
+    assert not is_valid
+
 def test_rate_limiting():
     """Test rate limiting functionality"""
     print("\nTesting rate limiting...")
@@ -49,7 +54,69 @@ def test_rate_limiting():
     expected_allowed = min(total_requests, settings.rate_limit_per_minute)
     print(f"Rate limiting: {'PASS' if requests_allowed <= expected_allowed else 'FAIL'}")
 
+def test_concurrent_request_limiting():
+    """Test that requests beyond the per-caller concurrency limit are rejected while others are in flight"""
+    print("\nTesting concurrent request limiting...")
+
+    import httpx
+    from main import app
+    from models.query import QueryResponse
+    from services.rag_service import rag_service
+
+    max_concurrent = concurrency_limiter.max_concurrent
+    state = {}
+
+    async def slow_query(query_request):
+        state["in_flight"] += 1
+        await state["release"].wait()
+        return QueryResponse(answer="ok", citations=[], query_id="test", timestamp="2024-01-01T00:00:00Z")
+
+    async def run(headers):
+        state["in_flight"] = 0
+        state["release"] = asyncio.Event()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            held = [
+                asyncio.create_task(client.post("/v1/query", json={"query": f"question {i}"}, headers=headers))
+                for i in range(max_concurrent)
+            ]
+            # Wait until every slot is held by a request still being processed
+            for _ in range(500):
+                if state["in_flight"] == max_concurrent:
+                    break
+                await asyncio.sleep(0.01)
+
+            rejected = await client.post("/v1/query", json={"query": "one too many"}, headers=headers)
+            unauthenticated = await client.post("/v1/query", json={"query": "no key"})
+            state["release"].set()
+            return rejected, unauthenticated, await asyncio.gather(*held)
+
+    service = rag_service.get_instance()
+    original_query = service.query_documentation
+    original_require_api_key = settings.require_api_key
+    service.query_documentation = slow_query
+    try:
+        # Without REQUIRE_API_KEY callers are limited by client address and need no key;
+        # with it, by API key, and a request without one is refused
+        for require_api_key, headers in ((False, {}), (True, {"Authorization": f"Bearer {settings.api_key}"})):
+            settings.require_api_key = require_api_key
+            # Start from a full rate-limit bucket so only the concurrency limit can reject
+            rate_limiter.buckets.pop(settings.api_key, None)
+            rejected, unauthenticated, held = asyncio.run(run(headers))
+
+            mode = "API key" if require_api_key else "client address"
+            print(f"[{mode}] Concurrent requests accepted: {sum(r.status_code == 200 for r in held)}/{max_concurrent}")
+            print(f"[{mode}] Request {max_concurrent + 1} rejected: {'PASS' if rejected.status_code == 429 else 'FAIL'}")
+            assert all(r.status_code == 200 for r in held)
+            assert rejected.status_code == 429
+            assert unauthenticated.status_code == (401 if require_api_key else 429)
+            assert not concurrency_limiter.active
+    finally:
+        settings.require_api_key = original_require_api_key
+        service.query_documentation = original_query
+
 if __name__ == "__main__":
     test_api_key_validation()
     test_rate_limiting()
+    test_concurrent_request_limiting()
     print("\nAuthentication testing completed!")
\ No newline at end of file
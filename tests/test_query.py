@@ -4,13 +4,23 @@ Simple test script to verify the query functionality
 import asyncio
 import sys
 import os
+import json
 
 # Add the backend directory to the path so we can import our modules
 sys.path.insert(0, os.path.abspath('.'))
 
+from fastapi.testclient import TestClient
 from models.query import QueryRequest
+from services.qdrant_service import qdrant_service
 from services.rag_service import rag_service
 
+async def run_query(query_request):
+    """Answer one query, closing the Qdrant channel bound to this event loop afterwards"""
+    try:
+        return await rag_service.get_instance().query_documentation(query_request)
+    finally:
+        await qdrant_service.close()
+
 def test_query_functionality():
     """Test the RAG query functionality with sample data"""
     print("Testing RAG query functionality...")
@@ -25,7 +35,7 @@ def test_query_functionality():
     print(f"Query: {query_request.query}")
 
     # Process the query
-    response = rag_service.query_documentation(query_request)
+    response = asyncio.run(run_query(query_request))
 
     print(f"Response: {response.answer[:200]}...")  # First 200 chars
     print(f"Number of citations: {len(response.citations)}")
@@ -42,5 +52,93 @@ def test_query_functionality():
 
     print("Query functionality test completed!")
 
+def test_batch_query_endpoint():
+    """Test that /v1/query/batch answers in order, isolates failures and reuses every cache tier"""
+    print("\nTesting batch query endpoint...")
+
+    from main import app
+    from services.agent_service import agent_service
+    from services.qdrant_service import qdrant_service
+    from utils.cache import cache
+
+    service = rag_service.get_instance()
+    agent = agent_service.get_instance()
+    qdrant = qdrant_service.get_instance()
+
+    exact_hit = "batch test: what is a ROS 2 node?"
+    semantic_hit = "batch test: how do ROS 2 nodes talk?"
+    generated = "batch test: what is a ROS 2 topic?"
+    failing = "batch test: what is a ROS 2 service?"
+    cache.set(exact_hit, {"answer": "exact cache answer", "citations": [],
+                          "query_id": "old", "timestamp": "2024-01-01T00:00:00Z"})
+
+    embedded_texts = []
+    rows = {}
+
+    def fake_generate_embeddings(texts, input_type="search_document"):
+        # A distinct one-hot vector per text, so every query gets a real (cacheable) embedding
+        embedded_texts.extend(texts)
+        vectors = []
+        for text in texts:
+            vector = [0.0] * 1024
+            vector[rows.setdefault(text, len(rows))] = 1.0
+            vectors.append(vector)
+        return vectors
+
+    async def fake_search_cached_response(query_vector, selected_text, threshold, ttl):
+        if query_vector[rows[semantic_hit]] > 0:
+            return json.dumps({"answer": "query cache answer", "citations": [],
+                               "query_id": "old", "timestamp": "2024-01-01T00:00:00Z"})
+        return None
+
+    async def fake_search_documents_batch(query_vectors, limit=5):
+        return [[{"document_id": f"doc_{n}", "title": "ROS 2", "url": "https://docs.ros.org",
+                  "text_snippet": "ROS 2 docs", "context_prefix": "ROS 2 docs", "relevance_score": 0.9}]
+                for n in range(len(query_vectors))]
+
+    async def fake_cache_response(**kwargs):
+        return True
+
+    async def fake_generate_response(query, context, selected_text=""):
+        if query == failing:
+            raise RuntimeError("LLM unavailable")
+        return {"answer": f"generated answer to {query}"}
+
+    patches = [
+        (service, "generate_embeddings", fake_generate_embeddings),
+        (qdrant, "search_cached_response", fake_search_cached_response),
+        (qdrant, "search_documents_batch", fake_search_documents_batch),
+        (qdrant, "cache_response", fake_cache_response),
+        (agent, "generate_response", fake_generate_response),
+    ]
+    originals = [(obj, name, getattr(obj, name)) for obj, name, _ in patches]
+    for obj, name, fake in patches:
+        setattr(obj, name, fake)
+    try:
+        client = TestClient(app)
+        queries = [generated, exact_hit, failing, semantic_hit]
+        response = client.post("/v1/query/batch", json={"queries": [{"query": q} for q in queries]})
+        assert response.status_code == 200
+        answers = [r["answer"] for r in response.json()["responses"]]
+        print(f"Batch answers: {answers}")
+
+        assert answers[0] == f"generated answer to {generated}"
+        assert answers[1] == "exact cache answer"
+        assert "error" in response.json()["responses"][2]["metadata"]
+        assert answers[3] == "query cache answer"
+        # The exact cache hit is never embedded
+        assert sorted(embedded_texts) == sorted([generated, failing, semantic_hit])
+
+        # Repeating the failed query embeds nothing new: its embedding comes from the LRU cache
+        embedded_texts.clear()
+        response = client.post("/v1/query/batch", json={"queries": [{"query": failing}, {"query": generated}]})
+        assert response.status_code == 200
+        assert embedded_texts == []
+        print("Batch ordering, errors and cache reuse: PASS")
+    finally:
+        for obj, name, original in originals:
+            setattr(obj, name, original)
+
 if __name__ == "__main__":
-    test_query_functionality()
\ No newline at end of file
+    test_query_functionality()
+    test_batch_query_endpoint()
\ No newline at end of file
@@ -73,7 +73,7 @@ def test_caching():
     }
 
     print(f"Cache size before set: {cache.size()}")
-    cache.set(test_query, "", test_response)
+    cache.set(test_query, test_response, "")
     print(f"Cache size after set: {cache.size()}")
 
     # Test cache get
@@ -81,13 +81,15 @@ def test_caching():
     print(f"Cached result retrieved: {cached_result is not None}")
     if cached_result:
         print(f"Answer: {cached_result['answer'][:50]}...")
+    assert cached_result == test_response
 
     # Test cache miss
     miss_result = cache.get("non-existent query", "")
     print(f"Cache miss result: {miss_result is None}")
+    assert miss_result is None
 
     # Test cache cleanup
-    cache.set("expired_query", "", test_response, ttl=1)  # 1 second TTL
+    cache.set("expired_query", test_response, "", ttl=1)  # 1 second TTL
     print(f"Cache size after adding expired item: {cache.size()}")
     time.sleep(2)  # Wait for item to expire
     removed_count = cache.cleanup_expired()
@@ -0,0 +1,73 @@
+"""
+Test script for the semantic (embedding-similarity) cache
+"""
+import sys
+import os
+import numpy as np
+
+# Add the backend directory to the path so we can import our modules
+sys.path.insert(0, os.path.abspath('.'))
+
+from services.semantic_cache import SemanticCache
+
+def test_semantic_cache_hit_and_miss():
+    """Test that near-duplicate vectors hit and unrelated vectors miss"""
+    print("Testing semantic cache...")
+
+    semantic_cache = SemanticCache(threshold=0.95)
+    rng = np.random.default_rng(0)
+    query_vec = rng.standard_normal(1024)
+    results = [{"document_id": "doc_1", "content": "ROS 2 is a robot framework"}]
+
+    semantic_cache.set(query_vec.tolist(), results, "ROS 2 is a flexible framework")
+    print(f"Cache size after set: {semantic_cache.size()}")
+
+    # A slightly perturbed vector should be served from the cache
+    near_vec = query_vec + rng.standard_normal(1024) * 0.01
+    hit = semantic_cache.get(near_vec.tolist())
+    print(f"Near-duplicate hit: {'PASS' if hit and hit['answer'] else 'FAIL'}")
+    assert hit is not None and hit["results"] == results
+
+    # An unrelated vector should miss
+    miss = semantic_cache.get(rng.standard_normal(1024).tolist())
+    print(f"Unrelated miss: {'PASS' if miss is None else 'FAIL'}")
+    assert miss is None
+
+    # Zero (mock) embeddings are never cached
+    semantic_cache.set([0.0] * 1024, results)
+    print(f"Zero vector ignored: {'PASS' if semantic_cache.size() == 1 else 'FAIL'}")
+    assert semantic_cache.size() == 1
+
+def test_semantic_cache_eviction():
+    """Test that the oldest entry is evicted once the cache is full"""
+    print("\nTesting semantic cache eviction...")
+
+    semantic_cache = SemanticCache(max_entries=2)
+    rng = np.random.default_rng(1)
+    vectors = [rng.standard_normal(64) for _ in range(3)]
+    for i, vec in enumerate(vectors):
+        semantic_cache.set(vec.tolist(), [{"document_id": f"doc_{i}"}])
+
+    print(f"Cache size after 3 inserts: {semantic_cache.size()}")
+    assert semantic_cache.size() == 2
+    assert semantic_cache.get(vectors[0].tolist()) is None
+    assert semantic_cache.get(vectors[2].tolist()) is not None
+
+def test_semantic_cache_ttl():
+    """Test that expired entries are no longer served"""
+    print("\nTesting semantic cache TTL...")
+
+    semantic_cache = SemanticCache(ttl=0)
+    vec = np.random.default_rng(2).standard_normal(64)
+    semantic_cache.set(vec.tolist(), [{"document_id": "doc_0"}], "stale answer")
+
+    expired = semantic_cache.get(vec.tolist())
+    print(f"Expired entry missed: {'PASS' if expired is None else 'FAIL'}")
+    assert expired is None
+    assert semantic_cache.size() == 0
+
+if __name__ == "__main__":
+    test_semantic_cache_hit_and_miss()
+    test_semantic_cache_eviction()
+    test_semantic_cache_ttl()
+    print("\nSemantic cache testing completed!")
@@ -1,17 +1,27 @@
-from fastapi import HTTPException, Security, status
+import hmac
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from fastapi import Depends, HTTPException, Request, Security, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from config.settings import settings
-from .rate_limit import check_rate_limit
+from .rate_limit import check_rate_limit, concurrency_limiter
 import logging
 
 logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
+# Lets request_identity accept requests without a Bearer token when API keys are not required
+optional_security = HTTPBearer(auto_error=False)
 
-def verify_api_key(auth: HTTPAuthorizationCredentials = Security(security)) -> str:
-    """
-    Verify the API key from the Authorization header and check rate limits
-    """
+# Encoded once so each request compares raw bytes
+_API_KEY_BYTES = settings.api_key.encode()
+
+def _matches_api_key(api_key: str) -> bool:
+    """Compare an API key to the configured one in constant time"""
+    return hmac.compare_digest(api_key.encode(), _API_KEY_BYTES)
+
+def _authenticate(auth: Optional[HTTPAuthorizationCredentials]) -> str:
+    """Return the API key if it matches the configured one, raising 401 otherwise"""
     if not auth or not auth.credentials:
         logger.warning("No API key provided in request")
         raise HTTPException(
@@ -21,7 +31,7 @@ def verify_api_key(auth: HTTPAuthorizationCredentials = Security(security)) -> s
         )
 
     # Compare the provided API key with the expected one
-    if auth.credentials != settings.api_key:
+    if not _matches_api_key(auth.credentials):
         logger.warning("Invalid API key provided")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -29,20 +39,73 @@ def verify_api_key(auth: HTTPAuthorizationCredentials = Security(security)) -> s
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    return auth.credentials
+
+def _raise_rate_limited(api_key: str) -> None:
+    logger.warning("Rate limit exceeded for API key: %s", api_key)
+    raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Rate limit exceeded",
+        headers={"Retry-After": "60"},
+    )
+
+def verify_api_key(auth: HTTPAuthorizationCredentials = Security(security)) -> str:
+    """
+    Verify the API key from the Authorization header and check rate limits
+    """
+    api_key = _authenticate(auth)
+
     # Check rate limit
-    if not check_rate_limit(auth.credentials):
-        logger.warning(f"Rate limit exceeded for API key: {auth.credentials}")
+    if not check_rate_limit(api_key):
+        _raise_rate_limited(api_key)
+
+    logger.info("API key validated successfully")
+    return api_key
+
+def request_identity(request: Request,
+                     auth: Optional[HTTPAuthorizationCredentials] = Security(optional_security)) -> str:
+    """
+    Identify the caller for limiting: the verified API key when REQUIRE_API_KEY is on,
+    otherwise the client address (no authentication, as before API keys were optional)
+    """
+    if settings.require_api_key:
+        return _authenticate(auth)
+    return f"client:{request.client.host if request.client else 'unknown'}"
+
+@contextmanager
+def request_slots(identity: str, queries: int = 1) -> Iterator[int]:
+    """
+    Admit a request worth `queries` queries: API keys spend one rate-limit token per query,
+    and up to MAX_CONCURRENT_REQUESTS in-flight slots are held until the request finishes.
+    Yields the number of slots held, which is how many queries may run at once.
+    """
+    if settings.require_api_key and not check_rate_limit(identity, queries):
+        _raise_rate_limited(identity)
+
+    slots = min(queries, concurrency_limiter.max_concurrent)
+    if not concurrency_limiter.acquire(identity, slots):
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded",
-            headers={"Retry-After": "60"},
+            detail="Too many concurrent requests",
+            headers={"Retry-After": "1"},
         )
+    try:
+        yield slots
+    finally:
+        concurrency_limiter.release(identity, slots)
 
-    logger.info("API key validated successfully")
-    return auth.credentials
+def limit_concurrent_requests(identity: str = Depends(request_identity)) -> Iterator[str]:
+    """
+    Hold one of the caller's in-flight request slots until the response is sent,
+    so slow queries cannot tie up every worker while staying under the per-minute rate
+    """
+    with request_slots(identity):
+        yield identity
 
 def validate_api_key_in_header(api_key_header: str) -> bool:
     """
     Validate the API key provided in the header
     """
-    return api_key_header == settings.api_key
\ No newline at end of file
+    if not api_key_header:
+        return False
+    return _matches_api_key(api_key_header)
\ No newline at end of file
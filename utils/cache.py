@@ -1,41 +1,58 @@
-import hashlib
+import heapq
+import threading
+from collections import OrderedDict
 import json
 import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, NamedTuple, Tuple
 from datetime import datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
+class CacheEntry(NamedTuple):
+    """A cached value and its absolute expiry time (a tuple, far smaller than a per-entry dict)"""
+    expiry: float
+    value: Dict[str, Any]
+
 class SimpleCache:
-    def __init__(self, default_ttl: int = 3600):  # 1 hour default TTL
-        self.cache: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, default_ttl: int = 3600, max_size: int = 10_000):  # 1 hour default TTL
+        # Kept in least- to most-recently-used order so the oldest entry is evicted first
+        self.cache: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
         self.default_ttl = default_ttl
-
-    def _generate_key(self, query: str, selected_text: str = "") -> str:
+        self.max_size = max_size
+        # (expiry, key) min-heap so cleanup only visits expired entries; items outdated by
+        # a later set, delete or eviction are skipped lazily and compacted away by set
+        self._expiry_heap: List[Tuple[float, Tuple[str, str]]] = []
+        # Sync routes run on a thread pool; the dict order and the heap must change together
+        self.lock = threading.Lock()
+
+    def _generate_key(self, query: str, selected_text: str = "") -> Tuple[str, str]:
         """Generate a cache key based on the query and selected text"""
-        cache_input = f"{query}::{selected_text}"
-        return hashlib.md5(cache_input.encode()).hexdigest()
+        # The dict hashes (and str objects memoize) the key itself, so no digest is needed.
+        # No selection is keyed as "", so keys stay comparable in the expiry heap
+        return (query, selected_text or "")
 
     def get(self, query: str, selected_text: str = "") -> Optional[Dict[str, Any]]:
         """Get a value from the cache"""
         key = self._generate_key(query, selected_text)
 
-        if key in self.cache:
-            cached_item = self.cache[key]
+        with self.lock:
+            # One lookup serves both the membership test and the fetch
+            cached_item = self.cache.get(key)
+            if cached_item is None:
+                logger.info("Cache miss: %.50s (not found)", key[0])
+                return None
 
             # Check if the item has expired
-            if time.time() > cached_item["expiry"]:
+            if time.time() > cached_item.expiry:
                 # Remove expired item
                 del self.cache[key]
-                logger.info(f"Cache miss: {key} (expired)")
+                logger.info("Cache miss: %.50s (expired)", key[0])
                 return None
 
-            logger.info(f"Cache hit: {key}")
-            return cached_item["value"]
-
-        logger.info(f"Cache miss: {key} (not found)")
-        return None
+            self.cache.move_to_end(key)
+        logger.info("Cache hit: %.50s", key[0])
+        return cached_item.value
 
     def set(self, query: str, value: Dict[str, Any], selected_text: str = "", ttl: Optional[int] = None) -> None:
         """Set a value in the cache"""
@@ -44,47 +61,74 @@ class SimpleCache:
         if ttl is None:
             ttl = self.default_ttl
 
-        expiry_time = time.time() + ttl
+        current_time = time.time()
+        expiry_time = current_time + ttl
+
+        with self.lock:
+            # Drop already-expired entries first so the size bound only ever evicts live ones
+            self._remove_expired(current_time)
 
-        self.cache[key] = {
-            "value": value,
-            "expiry": expiry_time
-        }
+            self.cache[key] = CacheEntry(expiry_time, value)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+            heapq.heappush(self._expiry_heap, (expiry_time, key))
+            # Items of overwritten, deleted and evicted keys linger until they expire, so
+            # rebuild from the live entries once they are the majority; amortized O(1) per set
+            if len(self._expiry_heap) > 2 * len(self.cache):
+                self._rebuild_expiry_heap()
 
-        logger.info(f"Cache set: {key} (ttl: {ttl}s)")
+        logger.info("Cache set: %.50s (ttl: %ss)", key[0], ttl)
 
     def delete(self, query: str, selected_text: str = "") -> bool:
         """Delete a value from the cache"""
         key = self._generate_key(query, selected_text)
 
-        if key in self.cache:
-            del self.cache[key]
-            logger.info(f"Cache delete: {key}")
+        with self.lock:
+            deleted = self.cache.pop(key, None) is not None
+
+        if deleted:
+            logger.info("Cache delete: %.50s", key[0])
             return True
 
         return False
 
     def clear(self) -> None:
         """Clear all items from the cache"""
-        self.cache.clear()
+        with self.lock:
+            self.cache.clear()
+            self._expiry_heap.clear()
         logger.info("Cache cleared")
 
+    def _rebuild_expiry_heap(self) -> None:
+        """Recreate the heap with exactly one item per live entry. Caller holds the lock"""
+        self._expiry_heap = [(entry.expiry, key) for key, entry in self.cache.items()]
+        heapq.heapify(self._expiry_heap)
+
+    def _remove_expired(self, current_time: float) -> int:
+        """Pop expired heap items and remove their entries; O(k log n) for k expirations. Caller holds the lock"""
+        entries = self.cache
+        initial_count = len(entries)
+
+        # Bind the lookups used per popped item to locals
+        heap = self._expiry_heap
+        heappop = heapq.heappop
+        get_entry = entries.get
+        while heap and heap[0][0] < current_time:
+            expiry_time, key = heappop(heap)
+            item = get_entry(key)
+            # Only remove the entry this heap item was pushed for
+            if item is not None and item.expiry == expiry_time:
+                del entries[key]
+
+        return initial_count - len(entries)
+
     def cleanup_expired(self) -> int:
         """Remove all expired items from the cache and return count of removed items"""
-        current_time = time.time()
-        initial_count = len(self.cache)
-
-        expired_keys = [
-            key for key, item in self.cache.items()
-            if current_time > item["expiry"]
-        ]
-
-        for key in expired_keys:
-            del self.cache[key]
-
-        removed_count = initial_count - len(self.cache)
+        with self.lock:
+            removed_count = self._remove_expired(time.time())
         if removed_count > 0:
-            logger.info(f"Cleaned up {removed_count} expired cache entries")
+            logger.info("Cleaned up %d expired cache entries", removed_count)
 
         return removed_count
 
@@ -1,21 +1,81 @@
+import queue
+import threading
 import time
 import logging
-from typing import Dict, Any, Callable
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, Callable, List, Optional
 from fastapi import Request, Response
 from config.settings import settings
 from utils.response_quality import response_quality_metrics
 
 logger = logging.getLogger(__name__)
 
+# Background thread that writes root log records for the request path
+_log_listener: Optional[QueueListener] = None
+
+def start_log_listener() -> None:
+    """
+    Route root logger records through a queue so handler I/O (stderr, files)
+    happens on a background thread instead of the request thread
+    """
+    global _log_listener
+    if _log_listener is not None:
+        return
+
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    log_queue = queue.SimpleQueue()
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+
+    _log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+
+def stop_log_listener() -> None:
+    """Flush queued records and restore the original root handlers"""
+    global _log_listener
+    if _log_listener is None:
+        return
+
+    _log_listener.stop()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, QueueHandler):
+            root.removeHandler(handler)
+    for handler in _log_listener.handlers:
+        root.addHandler(handler)
+    _log_listener = None
+
 class MonitoringService:
     def __init__(self):
-        self.request_count = 0
-        self.error_count = 0
+        # Per-thread [requests, errors] counters, summed on read; each thread only
+        # increments its own shard, so updates need no lock and never race
+        self._local = threading.local()
+        self._shards: List[List[int]] = []
+        self._shards_lock = threading.Lock()
         self.start_time = time.time()
 
+    def _shard(self) -> List[int]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = [0, 0]
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    @property
+    def request_count(self) -> int:
+        return sum(shard[0] for shard in self._shards)
+
+    @property
+    def error_count(self) -> int:
+        return sum(shard[1] for shard in self._shards)
+
     def log_request(self, request: Request, response: Response, process_time: float):
         """Log request metrics"""
-        self.request_count += 1
+        shard = self._shard()
+        shard[0] += 1
 
         log_data = {
             "method": request.method,
@@ -28,23 +88,25 @@ class MonitoringService:
 
         # Log as info for successful requests, error for failed ones
         if 200 <= response.status_code < 400:
-            logger.info(f"Request processed: {log_data}")
+            logger.info("Request processed: %s", log_data)
         else:
-            self.error_count += 1
-            logger.error(f"Request failed: {log_data}")
+            shard[1] += 1
+            logger.error("Request failed: %s", log_data)
 
     def get_system_metrics(self) -> Dict[str, Any]:
         """Get system metrics for monitoring"""
         uptime = time.time() - self.start_time
+        request_count = self.request_count
+        error_count = self.error_count
 
         # Get response quality metrics
         quality_metrics = response_quality_metrics.get_metrics()
 
         return {
             "uptime_seconds": uptime,
-            "total_requests": self.request_count,
-            "total_errors": self.error_count,
-            "error_rate": self.error_count / self.request_count if self.request_count > 0 else 0,
+            "total_requests": request_count,
+            "total_errors": error_count,
+            "error_rate": error_count / request_count if request_count > 0 else 0,
             "response_quality": quality_metrics,
             "api_status": "healthy"
         }
@@ -1,45 +1,85 @@
 import time
-from collections import defaultdict
-from typing import Dict
+from typing import Dict, List
 import threading
 from config.settings import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Number of lock shards; must be a power of two so a key's shard is hash(key) & (LOCK_SHARDS - 1)
+LOCK_SHARDS = 64
+
 class RateLimiter:
     def __init__(self, requests_per_minute: int = settings.rate_limit_per_minute):
         self.requests_per_minute = requests_per_minute
-        self.requests: Dict[str, list] = defaultdict(list)  # API key -> list of request timestamps
-        self.lock = threading.Lock()
+        # Token bucket per API key: [tokens available, monotonic time of the last refill]
+        self.buckets: Dict[str, List[float]] = {}
+        # Sharded locks so checks for different API keys rarely contend
+        self.locks = [threading.Lock() for _ in range(LOCK_SHARDS)]
 
-    def is_allowed(self, api_key: str) -> bool:
+    def is_allowed(self, api_key: str, cost: int = 1) -> bool:
         """
-        Check if a request from the given API key is allowed based on rate limits
+        Check if a request from the given API key is allowed based on rate limits;
+        a request worth several queries (a batch) spends one token per query
         """
-        with self.lock:
-            current_time = time.time()
-
-            # Clean old requests (older than 1 minute)
-            self.requests[api_key] = [
-                timestamp for timestamp in self.requests[api_key]
-                if current_time - timestamp < 60  # 60 seconds = 1 minute
-            ]
-
-            # Check if the number of requests is under the limit
-            if len(self.requests[api_key]) < self.requests_per_minute:
-                # Add current request
-                self.requests[api_key].append(current_time)
+        with self.locks[hash(api_key) & (LOCK_SHARDS - 1)]:
+            current_time = time.monotonic()
+            capacity = self.requests_per_minute
+
+            bucket = self.buckets.get(api_key)
+            if bucket is None:
+                bucket = self.buckets[api_key] = [float(capacity), current_time]
+            else:
+                # Refill lazily for the time elapsed since the last request
+                bucket[0] = min(capacity, bucket[0] + (current_time - bucket[1]) * capacity / 60)
+                bucket[1] = current_time
+
+            # Spend the tokens if available
+            if bucket[0] >= cost:
+                bucket[0] -= cost
                 return True
             else:
-                logger.warning(f"Rate limit exceeded for API key: {api_key}")
+                logger.warning("Rate limit exceeded for API key: %s", api_key)
                 return False
 
 # Create a global rate limiter instance
 rate_limiter = RateLimiter()
 
-def check_rate_limit(api_key: str) -> bool:
+def check_rate_limit(api_key: str, cost: int = 1) -> bool:
     """
     Check if the API key is within rate limits
     """
-    return rate_limiter.is_allowed(api_key)
\ No newline at end of file
+    return rate_limiter.is_allowed(api_key, cost)
+
+class ConcurrencyLimiter:
+    """
+    Caps the number of in-flight queries per caller (API key, or client address when
+    API keys are not required), independent of the per-minute rate
+    """
+
+    def __init__(self, max_concurrent: int = settings.max_concurrent_requests):
+        self.max_concurrent = max_concurrent
+        self.active: Dict[str, int] = {}  # API key -> requests currently being processed
+        self.lock = threading.Lock()
+
+    def acquire(self, api_key: str, slots: int = 1) -> bool:
+        """Reserve in-flight slots for the API key, all or none"""
+        with self.lock:
+            active = self.active.get(api_key, 0)
+            if active + slots > self.max_concurrent:
+                logger.warning("Concurrent request limit exceeded for API key: %s", api_key)
+                return False
+            self.active[api_key] = active + slots
+            return True
+
+    def release(self, api_key: str, slots: int = 1) -> None:
+        """Free slots reserved by acquire"""
+        with self.lock:
+            active = self.active.get(api_key, 0) - slots
+            if active > 0:
+                self.active[api_key] = active
+            else:
+                self.active.pop(api_key, None)
+
+# Create a global concurrency limiter instance
+concurrency_limiter = ConcurrencyLimiter()
\ No newline at end of file
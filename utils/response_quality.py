@@ -1,22 +1,24 @@
 import logging
+from collections import deque
 from typing import Dict, Any, List
 from models.query import QueryResponse, Citation
 import time
 
 logger = logging.getLogger(__name__)
 
+RESPONSE_TIME_WINDOW = 1024
+
 class ResponseQualityMetrics:
     def __init__(self):
         self.metrics = {
             "total_queries": 0,
             "successful_queries": 0,
             "failed_queries": 0,
-            "avg_response_time": 0,
             "total_response_time": 0,
-            "avg_citations_per_response": 0,
             "total_citations": 0
         }
-        self.response_times = []
+        # Rolling window of the most recent response times
+        self.response_times = deque(maxlen=RESPONSE_TIME_WINDOW)
 
     def log_query_start(self) -> float:
         """Record the start time of a query"""
@@ -38,16 +40,6 @@ class ResponseQualityMetrics:
         else:
             self.metrics["failed_queries"] += 1
 
-        # Update averages
-        self.metrics["avg_response_time"] = (
-            self.metrics["total_response_time"] / self.metrics["successful_queries"]
-            if self.metrics["successful_queries"] > 0 else 0
-        )
-        self.metrics["avg_citations_per_response"] = (
-            self.metrics["total_citations"] / self.metrics["successful_queries"]
-            if self.metrics["successful_queries"] > 0 else 0
-        )
-
     def validate_response_accuracy(self, response: QueryResponse, source_context: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Validate response accuracy against source documents
@@ -63,12 +55,21 @@ class ResponseQualityMetrics:
 
         # Check if citations are properly linked to source context
         if response.citations and source_context:
-            cited_sources = {cit.document_id for cit in response.citations}
-            available_sources = {doc.get("document_id") for doc in source_context if doc.get("document_id")}
-
-            # Check for citation accuracy
-            if cited_sources.issubset(available_sources):
-                validation_result["sources_used"] = list(cited_sources.intersection(available_sources))
+            available_sources = frozenset(
+                doc["document_id"] for doc in source_context if doc.get("document_id")
+            )
+
+            # Check for citation accuracy in one pass; the dict keeps cited sources unique
+            sources_used = {}
+            has_unknown_source = False
+            for cit in response.citations:
+                if cit.document_id not in available_sources:
+                    has_unknown_source = True
+                    break
+                sources_used[cit.document_id] = None
+
+            if not has_unknown_source:
+                validation_result["sources_used"] = list(sources_used)
             else:
                 validation_result["is_accurate"] = False
                 validation_result["confidence_score"] = 0.5
@@ -89,7 +90,12 @@ class ResponseQualityMetrics:
 
     def get_metrics(self) -> Dict[str, Any]:
         """Get current quality metrics"""
-        return self.metrics.copy()
+        # Averages are derived here rather than on every logged query
+        metrics = self.metrics.copy()
+        successful = metrics["successful_queries"]
+        metrics["avg_response_time"] = metrics["total_response_time"] / successful if successful else 0
+        metrics["avg_citations_per_response"] = metrics["total_citations"] / successful if successful else 0
+        return metrics
 
     def reset_metrics(self):
         """Reset all metrics to initial state"""
@@ -97,12 +103,10 @@ class ResponseQualityMetrics:
             "total_queries": 0,
             "successful_queries": 0,
             "failed_queries": 0,
-            "avg_response_time": 0,
             "total_response_time": 0,
-            "avg_citations_per_response": 0,
             "total_citations": 0
         }
-        self.response_times = []
+        self.response_times = deque(maxlen=RESPONSE_TIME_WINDOW)
 
 # Create a singleton instance
 response_quality_metrics = ResponseQualityMetrics()
\ No newline at end of file